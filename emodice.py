@@ -5,198 +5,829 @@ https://github.com/D1A881/emodice
 """
 
 import sys
+import argparse
+import csv
+import hashlib
+import importlib
+import json
+import math
+import os
 import random
 import time
 
 MAX_DICE = 28
+# Larger rolls become a DicePool of face counts (see roll_pool).
+POOL_MAX = 10 ** 12
+POOL_ROLL_LIMIT = 4096
 DICE_FACES_STANDARD = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
 DICE_FACES_SKULL = ["☠", "⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
 
+# Dice are integer-coded: 0 = skull, 1-6 = pips, so a code indexes
+# DICE_FACES_SKULL directly. A roll is a bytes object of codes; emoji are
+# only produced when the dice are displayed.
+SKULL = 0
+FACE_CODES = {face: code for code, face in enumerate(DICE_FACES_SKULL)}
+
+# One random byte becomes one die. 252 is a multiple of both 6 and 7, so
+# bytes 0-251 map onto faces without bias and 252-255 are rejected.
+_STANDARD_TABLE = bytes(b % 6 + 1 for b in range(252)) + bytes(4)
+_SKULL_TABLE = bytes(b % 7 for b in range(252)) + bytes(4)
+_REJECTED_BYTES = bytes(range(252, 256))
+
+# Set to False by --no-delay to skip the dramatic pauses in the games.
+DELAYS = True
+
+# ============================================================
+# RENDERING
+# ============================================================
+# The interactive menu installs a Screen as sys.stdout. Printed text is
+# buffered and written in one write per flush: before input, pauses and
+# redraws. On an ANSI terminal clear_screen() starts a new frame drawn from
+# the top left, rewriting only the rows that differ from the previous frame
+# (changed scorecard lines, new dice) and erasing the rest. Frames taller or
+# wider than the terminal scroll, so the frame after one is repainted in
+# full. When stdout is not a terminal, text passes through with no escapes.
+def _width(text):
+    return len(text) + sum(1 for c in text if c > '\u1fff')
+
+class Screen:
+    def __init__(self, stream, ansi=None):
+        if ansi is None:
+            ansi = stream.isatty() and os.environ.get('TERM') != 'dumb'
+        self.stream = stream
+        self.ansi = ansi
+        self._pending = []
+        self._rows = [""]
+        self._previous = None
+        self._stale = True
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def write(self, text):
+        self._pending.append(text)
+        return len(text)
+
+    # Follows what the terminal shows for the current frame.
+    def _track(self, text):
+        parts = text.split("\n")
+        rows = self._rows
+        rows[-1] += parts[0]
+        rows.extend(parts[1:])
+        size = os.get_terminal_size(self.stream.fileno()) if self.ansi else None
+        touched = rows[len(rows) - len(parts):]
+        if size and (len(rows) >= size.lines or any(_width(r) >= size.columns for r in touched)):
+            self._stale = True
+
+    def _redraw(self, text):
+        previous, self._previous = self._previous, None
+        stale, self._stale = self._stale, False
+        self._rows = [""]
+        self._track(text)
+        if stale or self._stale:
+            return "\x1b[H\x1b[2J\x1b[3J" + text
+        rows = self._rows
+        last = len(rows) - 1
+        out = [f"\x1b[{i + 1};1H{row}\x1b[K" for i, row in enumerate(rows[:last])
+               if i >= len(previous) or row != previous[i]]
+        out.append(f"\x1b[{last + 2};1H\x1b[J\x1b[{last + 1};1H{rows[last]}\x1b[K")
+        return "".join(out)
+
+    def flush(self):
+        text = "".join(self._pending)
+        self._pending.clear()
+        if self._previous is not None:
+            text = self._redraw(text)
+        elif text and self.ansi:
+            self._track(text)
+        if text:
+            self.stream.write(text)
+        self.stream.flush()
+
+    def clear(self):
+        if not self.ansi:
+            self.write("\n")
+            return
+        self.flush()
+        self._previous = self._rows
+
+    def input(self, prompt=""):
+        self.write(prompt)
+        self.flush()
+        line = sys.stdin.readline()
+        if not line:
+            raise EOFError
+        if self.ansi:
+            self._track(line if line.endswith("\n") else line + "\n")
+        return line.rstrip("\n")
+
+SCREEN = None
+
 def clear_screen():
-    print("\n" * 50)
+    if SCREEN is not None:
+        SCREEN.clear()
+    else:
+        print("\n" * 50)
+
+# True when clear_screen() redraws in place rather than scrolling.
+def can_redraw():
+    return SCREEN is not None and SCREEN.ansi
+
+def ask(prompt=""):
+    if SCREEN is not None:
+        return SCREEN.input(prompt)
+    return input(prompt)
+
+def pause(seconds):
+    if DELAYS:
+        sys.stdout.flush()
+        time.sleep(seconds)
+
+# ============================================================
+# DICE SOURCES
+# ============================================================
+# A dice source turns random bytes from some generator into face codes. It
+# keeps a prefetched buffer of accepted bytes (0-251) that faces(n) slices
+# from and refills in one large generator call when it runs dry. Seeded
+# sources replay exactly; spawn() derives an independent child stream, e.g.
+# one per player.
+def derive_seed(seed, label, n=0):
+    digest = hashlib.sha256(f"emodice/{seed}/{label}/{n}".encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+# Binomial(n, p) variate from uniform(), by the method random.binomialvariate
+# uses in Python 3.12+: geometric skipping when n*p < 10, otherwise Hörmann's
+# BTRS transformed rejection. Cost does not depend on n.
+def _binomial(uniform, n, p):
+    if n <= 0 or p <= 0.0:
+        return 0
+    if p >= 1.0:
+        return n
+    if p > 0.5:
+        return n - _binomial(uniform, n, 1.0 - p)
+    if n * p < 10.0:
+        x = y = 0
+        c = math.log(1.0 - p)
+        while True:
+            y += math.floor(math.log(1.0 - uniform()) / c) + 1
+            if y > n:
+                return x
+            x += 1
+    spq = math.sqrt(n * p * (1.0 - p))
+    b = 1.15 + 2.53 * spq
+    a = -0.0873 + 0.0248 * b + 0.01 * p
+    c = n * p + 0.5
+    vr = 0.92 - 4.2 / b
+    alpha = (2.83 + 5.1 / b) * spq
+    lpq = math.log(p / (1.0 - p))
+    m = math.floor((n + 1) * p)
+    h = math.lgamma(m + 1) + math.lgamma(n - m + 1)
+    while True:
+        u = uniform() - 0.5
+        us = 0.5 - abs(u)
+        k = math.floor((2.0 * a / us + b) * u + c)
+        if k < 0 or k > n:
+            continue
+        v = uniform()
+        if us >= 0.07 and v <= vr:
+            return k
+        v *= alpha / (a / (us * us) + b)
+        if v > 0.0 and math.log(v) <= h - math.lgamma(k + 1) - math.lgamma(n - k + 1) + (k - m) * lpq:
+            return k
+
+class DiceSource:
+    name = None
+    prefetch = 65536
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self._buf = b""
+        self._pos = 0
+        self._spawned = 0
+
+    def _random_bytes(self, n):
+        raise NotImplementedError
+
+    def _accepted(self, n):
+        end = self._pos + n
+        if end > len(self._buf):
+            buf = self._buf[self._pos:]
+            while len(buf) < n:
+                want = max(self.prefetch, n - len(buf))
+                buf += self._random_bytes(want + (want >> 5) + 16).translate(None, _REJECTED_BYTES)
+            self._buf, self._pos, end = buf, 0, n
+        chunk = self._buf[self._pos:end]
+        self._pos = end
+        return chunk
+
+    def faces(self, n, include_skull=False):
+        return self._accepted(n).translate(_SKULL_TABLE if include_skull else _STANDARD_TABLE)
+
+    # Uniform float in [0, 1) with 53 random bits from the same generator.
+    def uniform(self):
+        return (int.from_bytes(self._random_bytes(7), 'little') >> 3) / 9007199254740992
+
+    # How many of count dice show each face code (index 0 = skull), drawn as
+    # a chain of binomials: each face takes its share of the dice not yet
+    # assigned. Small pools are rolled and counted instead.
+    def pool(self, count, include_skull=False):
+        if count <= POOL_ROLL_LIMIT:
+            dice = self.faces(count, include_skull)
+            return [dice.count(code) for code in range(7)]
+        counts = [0] * 7
+        left = count
+        for code in range(0 if include_skull else 1, 6):
+            counts[code] = _binomial(self.uniform, left, 1.0 / (7 - code))
+            left -= counts[code]
+        counts[6] = left
+        return counts
+
+    def spawn(self, label):
+        self._spawned += 1
+        child = type(self)(derive_seed(self.seed, label, self._spawned))
+        child.prefetch = self.prefetch
+        return child
+
+# Mersenne Twister via a private random.Random instance.
+class MersenneDice(DiceSource):
+    name = 'mt'
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.random = random.Random(self.seed)
+
+    def _random_bytes(self, n):
+        return self.random.getrandbits(8 * n).to_bytes(n, 'little')
+
+# Bulk NumPy bit generator (PCG64 by default, or Philox). Needs NumPy.
+class NumpyDice(DiceSource):
+    name = 'pcg64'
+    algorithm = 'PCG64'
+
+    def __init__(self, seed=None):
+        import numpy
+        super().__init__(seed)
+        self.generator = numpy.random.Generator(getattr(numpy.random, self.algorithm)(self.seed))
+
+    def _random_bytes(self, n):
+        return self.generator.bytes(n)
+
+    def pool(self, count, include_skull=False):
+        sides = 7 if include_skull else 6
+        counts = self.generator.multinomial(count, [1.0 / sides] * sides).tolist()
+        return counts if include_skull else [0] + counts
+
+class PhiloxDice(NumpyDice):
+    name = 'philox'
+    algorithm = 'Philox'
+
+# Operating-system CSPRNG for fair-play sessions. Cannot be seeded or
+# replayed; seed is kept only for interface compatibility.
+class SecureDice(DiceSource):
+    name = 'secure'
 
-def roll_dice(count, include_skull=False):
-    faces = DICE_FACES_SKULL if include_skull else DICE_FACES_STANDARD
-    return [random.choice(faces) for _ in range(count)]
+    def _random_bytes(self, n):
+        return os.urandom(n)
+
+    def spawn(self, label):
+        return SecureDice()
+
+# Adapts a bare random.Random (or the random module) passed as rng.
+class _RandomAdapter(DiceSource):
+    prefetch = 0
+
+    def __init__(self, rng):
+        super().__init__(0)
+        self.random = rng
+
+    def _random_bytes(self, n):
+        return self.random.getrandbits(8 * n).to_bytes(n, 'little')
+
+DICE_BACKENDS = {cls.name: cls for cls in (MersenneDice, NumpyDice, PhiloxDice, SecureDice)}
+
+def make_dice(backend='mt', seed=None):
+    try:
+        cls = DICE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown RNG backend: {backend!r}") from None
+    return cls(seed)
+
+_default_dice = None
+
+def set_default_dice(source):
+    global _default_dice
+    _default_dice = source
+
+def dice_source(rng=None):
+    global _default_dice
+    if rng is None:
+        if _default_dice is None:
+            _default_dice = MersenneDice()
+        return _default_dice
+    if hasattr(rng, 'faces'):
+        return rng
+    return _RandomAdapter(rng)
+
+# Rolls n_rolls rolls of dice_per_roll dice in one batch and returns them as
+# one flat bytes buffer: roll i is block[i*dice_per_roll:(i+1)*dice_per_roll].
+# rng is a DiceSource (default: the session source) or a random.Random.
+def roll_many(n_rolls, dice_per_roll, include_skull=False, rng=None):
+    return dice_source(rng).faces(n_rolls * dice_per_roll, include_skull)
+
+def roll_dice(count, include_skull=False, rng=None):
+    return dice_source(rng).faces(count, include_skull)
+
+# Rolls count dice (up to POOL_MAX) as a DicePool, in time and memory that
+# do not depend on count.
+def roll_pool(count, include_skull=False, rng=None):
+    return DicePool(dice_source(rng).pool(count, include_skull))
+
+# A roll kept as how many dice show each face code (counts[0] = skulls) rather
+# than one byte per die.
+class DicePool:
+    __slots__ = ('counts',)
+
+    def __init__(self, counts):
+        self.counts = tuple(counts)
+
+    @classmethod
+    def from_dice(cls, dice):
+        return cls(dice.count(code) for code in range(7))
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def count(self, code):
+        return self.counts[code]
+
+    @property
+    def total(self):
+        return sum(code * n for code, n in enumerate(self.counts))
+
+    # Seven 8-byte little-endian counts; never confused with a roll, which
+    # is at most MAX_DICE bytes.
+    def __bytes__(self):
+        return b"".join(n.to_bytes(8, 'little') for n in self.counts)
+
+    def __str__(self):
+        return "  ".join(f"{DICE_FACES_SKULL[code]}×{n:,}" for code, n in enumerate(self.counts) if n)
+
+# roll_dice up to MAX_DICE dice, roll_pool beyond it.
+def roll_count(count, include_skull=False, rng=None):
+    if count > MAX_DICE:
+        return roll_pool(count, include_skull, rng)
+    return roll_dice(count, include_skull, rng=rng)
+
+def dice_total(dice):
+    if isinstance(dice, DicePool):
+        return dice.total
+    return sum_dice(dice)
+
+def dice_str(dice):
+    if isinstance(dice, DicePool):
+        return str(dice)
+    return " ".join([DICE_FACES_SKULL[d] for d in dice])
 
 def display_dice(dice, message=""):
     if message:
         print(f"\n{message}")
-    print("  " + " ".join(dice))
+    print("  " + dice_str(dice))
     print()
 
 def dice_value(die):
-    if die == "☠":
-        return 0
-    return DICE_FACES_STANDARD.index(die) + 1
+    if isinstance(die, str):
+        return FACE_CODES[die]
+    return die
 
 def sum_dice(dice):
-    return sum(dice_value(d) for d in dice)
+    return sum(dice)
 
 def press_enter():
-    input("\nPress ENTER to continue...")
+    ask("\nPress ENTER to continue...")
+
+# ============================================================
+# GAME RULES
+# ============================================================
+# Pure scoring and outcome rules shared by the interactive games below and
+# the headless simulator in emodice_sim.py. None of these do any I/O.
+DOUBLES_POINTS = {2: 2, 3: 10, 4: 25, 5: 50, 6: 100}
+SEQUENCE_POINTS = {3: 20, 4: 50, 5: 100, 6: 200}
+TARGET_ATTEMPTS = 10
+# Live odds are shown for up to this many dice (exact tables, built in well
+# under a second).
+TARGET_ODDS_DICE = 200
+SKULL_SURVIVAL_DICE = 5
+SKULL_LIMIT = 3
+HOUSE_DICE = 5
+HOUSE_ROUNDS = 3
+HOUSE_WINS_NEEDED = 2
+YAHTZEE_UPPER = ['ones', 'twos', 'threes', 'fours', 'fives', 'sixes']
+YAHTZEE_LOWER = ['three_kind', 'four_kind', 'full_house', 'small_straight',
+                 'large_straight', 'yahtzee', 'chance']
+YAHTZEE_CATEGORIES = YAHTZEE_UPPER + YAHTZEE_LOWER
+YAHTZEE_NAMES = {
+    'ones': 'Ones', 'twos': 'Twos', 'threes': 'Threes',
+    'fours': 'Fours', 'fives': 'Fives', 'sixes': 'Sixes',
+    'three_kind': 'Three of a Kind', 'four_kind': 'Four of a Kind',
+    'full_house': 'Full House', 'small_straight': 'Small Straight',
+    'large_straight': 'Large Straight', 'yahtzee': 'YAHTZEE!', 'chance': 'Chance',
+}
+UPPER_BONUS_THRESHOLD = 63
+UPPER_BONUS = 35
+
+def count_values(dice):
+    counts = {}
+    for val in dice:
+        counts[val] = counts.get(val, 0) + 1
+    return counts
+
+def score_doubles(dice):
+    return sum(DOUBLES_POINTS.get(c, 0) for c in count_values(dice).values())
+
+def longest_run(dice):
+    unique = sorted(set(dice))
+    best = current = 1
+    for i in range(1, len(unique)):
+        if unique[i] == unique[i-1] + 1:
+            current += 1
+            best = max(best, current)
+        else:
+            current = 1
+    return best
+
+def score_sequences(dice):
+    return SEQUENCE_POINTS.get(longest_run(dice), 0)
+
+# 1 if the first total wins, 2 if the second does, 0 for a tie.
+def compare_totals(first, second):
+    if first > second:
+        return 1
+    if second > first:
+        return 2
+    return 0
+
+def skull_survival_step(score, skulls, dice):
+    return score + sum_dice(dice), skulls + dice.count(SKULL)
+
+def house_match_over(player_wins, house_wins):
+    return player_wins == HOUSE_WINS_NEEDED or house_wins == HOUSE_WINS_NEEDED
+
+# 'win', 'loss' or 'draw' from the player's side once a match has ended.
+def house_outcome(player_wins, house_wins):
+    if player_wins == HOUSE_WINS_NEEDED:
+        return 'win'
+    if house_wins == HOUSE_WINS_NEEDED:
+        return 'loss'
+    return 'draw'
+
+def yahtzee_score(dice, category):
+    values = list(dice)
+    counts = count_values(dice)
+    if category in YAHTZEE_UPPER:
+        target = YAHTZEE_UPPER.index(category) + 1
+        return values.count(target) * target
+    if category == 'three_kind':
+        return sum(values) if any(c >= 3 for c in counts.values()) else 0
+    if category == 'four_kind':
+        return sum(values) if any(c >= 4 for c in counts.values()) else 0
+    if category == 'full_house':
+        return 25 if sorted(counts.values()) == [2, 3] else 0
+    if category == 'small_straight':
+        unique = sorted(set(values))
+        for i in range(len(unique) - 3):
+            if unique[i:i+4] == list(range(unique[i], unique[i]+4)):
+                return 30
+        return 0
+    if category == 'large_straight':
+        unique = sorted(set(values))
+        return 40 if unique in [[1,2,3,4,5],[2,3,4,5,6]] else 0
+    if category == 'yahtzee':
+        return 50 if any(c == 5 for c in counts.values()) else 0
+    if category == 'chance':
+        return sum(values)
+    return 0
+
+# All 13 category scores at once, in YAHTZEE_CATEGORIES order, from a
+# face-count histogram of the roll.
+def yahtzee_scores(dice):
+    counts = [0] * 7
+    for die in dice:
+        counts[die] += 1
+    total = sum(dice)
+    most = max(counts)
+    present = [c > 0 for c in counts]
+    small = ((present[1] and present[2] and present[3] and present[4])
+             or (present[2] and present[3] and present[4] and present[5])
+             or (present[3] and present[4] and present[5] and present[6]))
+    large = most == 1 and len(dice) == 5 and (not present[1] or not present[6])
+    return [
+        counts[1], 2 * counts[2], 3 * counts[3], 4 * counts[4], 5 * counts[5], 6 * counts[6],
+        total if most >= 3 else 0,
+        total if most >= 4 else 0,
+        25 if 3 in counts and 2 in counts else 0,
+        30 if small else 0,
+        40 if large else 0,
+        50 if most == 5 else 0,
+        total,
+    ]
+
+YAHTZEE_IDS = {cat: i for i, cat in enumerate(YAHTZEE_CATEGORIES)}
+
+# Yahtzee scorecard indexed by category id (YAHTZEE_CATEGORIES order). Scores
+# live in a 13-byte bytearray (OPEN marks an unused category) that doubles as
+# the card's fixed-width serialized form, and the section totals and the
+# open-category bitmask are updated on every fill instead of being
+# recomputed. card[category] gives the score or None, like the old dict.
+class Scorecard:
+    __slots__ = ('scores', 'open_mask', 'upper_total', 'lower_total')
+    OPEN = 255
+    RECORD_SIZE = len(YAHTZEE_CATEGORIES)
+
+    def __init__(self):
+        self.scores = bytearray([self.OPEN]) * self.RECORD_SIZE
+        self.open_mask = (1 << self.RECORD_SIZE) - 1
+        self.upper_total = 0
+        self.lower_total = 0
+
+    @staticmethod
+    def category_id(category):
+        return category if isinstance(category, int) else YAHTZEE_IDS[category]
+
+    def __getitem__(self, category):
+        score = self.scores[self.category_id(category)]
+        return None if score == self.OPEN else score
+
+    def is_open(self, category):
+        return bool(self.open_mask >> self.category_id(category) & 1)
+
+    def open_ids(self):
+        return [i for i in range(self.RECORD_SIZE) if self.open_mask >> i & 1]
+
+    def fill(self, category, score):
+        cat_id = self.category_id(category)
+        if not self.open_mask >> cat_id & 1:
+            raise ValueError(f"{YAHTZEE_CATEGORIES[cat_id]} already scored")
+        self.scores[cat_id] = score
+        self.open_mask &= ~(1 << cat_id)
+        if cat_id < len(YAHTZEE_UPPER):
+            self.upper_total += score
+        else:
+            self.lower_total += score
+
+    @property
+    def upper_bonus(self):
+        return UPPER_BONUS if self.upper_total >= UPPER_BONUS_THRESHOLD else 0
+
+    @property
+    def grand_total(self):
+        return self.upper_total + self.upper_bonus + self.lower_total
+
+    @property
+    def complete(self):
+        return not self.open_mask
+
+    def to_bytes(self):
+        return bytes(self.scores)
+
+    @classmethod
+    def from_bytes(cls, record):
+        card = cls()
+        for cat_id, score in enumerate(record):
+            if score != cls.OPEN:
+                card.fill(cat_id, score)
+        return card
+
+    def as_dict(self):
+        return {cat: self[i] for i, cat in enumerate(YAHTZEE_CATEGORIES)}
+
+# Returns (upper_total, upper_bonus, lower_total, grand_total) for a
+# Scorecard or a category -> score dict; open categories count as zero.
+def yahtzee_totals(scorecard):
+    if isinstance(scorecard, Scorecard):
+        return (scorecard.upper_total, scorecard.upper_bonus,
+                scorecard.lower_total, scorecard.grand_total)
+    upper_total = sum(scorecard[c] or 0 for c in YAHTZEE_UPPER)
+    upper_bonus = UPPER_BONUS if upper_total >= UPPER_BONUS_THRESHOLD else 0
+    lower_total = sum(scorecard[c] or 0 for c in YAHTZEE_LOWER)
+    return upper_total, upper_bonus, lower_total, upper_total + upper_bonus + lower_total
+
+# ============================================================
+# HISTORY
+# ============================================================
+# Set by --history to an emodice_history.HistoryStore; games then log every
+# roll and their result to it under PLAYER.
+HISTORY = None
+PLAYER = 'player'
+# Set by --trace to an emodice_replay.TraceLog; games then append a replay
+# trace (seed, choices and result) when they finish.
+TRACES = None
+# Prefetch of a traced game's dice source. Replays must draw the same
+# bytes, and a small buffer keeps each replay cheap.
+TRACE_PREFETCH = 256
+
+# Games report every roll, each player decision that affects the dice or
+# the score (choose), and the result.
+class _NoRecord:
+    def roll(self, dice):
+        pass
+
+    def choose(self, *values):
+        pass
+
+    def finish(self, score, outcome=None):
+        pass
+
+NO_RECORD = _NoRecord()
+
+# Returns the dice source and record for a new game. A traced game gets its
+# own source, spawned from the session's, so its trace replays on its own;
+# the secure backend cannot be replayed and is never traced.
+def start_game(game, rng=None):
+    source = dice_source(rng)
+    traced = TRACES is not None and source.name not in (None, 'secure')
+    if traced:
+        source = rng = source.spawn('game')
+        source.prefetch = TRACE_PREFETCH
+    record = NO_RECORD if HISTORY is None else HISTORY.game(game, PLAYER, source.seed)
+    if traced:
+        record = TRACES.game(game, source, record)
+    return rng, record
+
+# A Yahtzee hold as trace values: a bitmask when the positions are distinct
+# and in order, as they almost always are, else 32 + count then the positions.
+def hold_trace(positions):
+    if all(a < b for a, b in zip(positions, positions[1:])):
+        return (sum(1 << i for i in positions),)
+    return (32 + len(positions), *positions)
 
 # ============================================================
 # GAME 1: SIMPLE ROLLER
 # ============================================================
-def game_simple_roller():
+def game_simple_roller(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 1: SIMPLE DICE ROLLER")
     print("=" * 60)
     try:
-        count = int(input(f"\nHow many dice to roll (1-{MAX_DICE})? "))
-        if count < 1 or count > MAX_DICE:
-            print(f"ERROR: Must be between 1 and {MAX_DICE}")
+        count = int(ask(f"\nHow many dice to roll (1-{MAX_DICE}, or up to {POOL_MAX:,} as a pool)? "))
+        if count < 1 or count > POOL_MAX:
+            print(f"ERROR: Must be between 1 and {POOL_MAX:,}")
             press_enter()
             return
     except ValueError:
         print("ERROR: Please enter a valid number!")
         press_enter()
         return
-    skull = input("Include skull face? (y/n): ").lower() == 'y'
+    skull = ask("Include skull face? (y/n): ").lower() == 'y'
     print("\n🎲 Rolling...")
-    time.sleep(0.5)
-    dice = roll_dice(count, skull)
+    pause(0.5)
+    rng, record = start_game('simple_roller', rng)
+    record.choose(count, skull)
+    dice = roll_count(count, skull, rng=rng)
+    record.roll(dice)
     display_dice(dice, "Result:")
-    total = sum_dice(dice)
-    print(f"Total: {total}")
+    total = dice_total(dice)
+    record.finish(total)
+    print(f"Total: {total:,}")
     press_enter()
 
 # ============================================================
 # GAME 8: YAHTZEE
 # ============================================================
-def game_yahtzee():
+def game_yahtzee(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 8: YAHTZEE")
     print("=" * 60)
     print("\nClassic Yahtzee! 13 rounds, 3 rolls per turn.")
     print("Fill your scorecard to maximize your score!\n")
-    scorecard = {
-        'ones': None, 'twos': None, 'threes': None,
-        'fours': None, 'fives': None, 'sixes': None,
-        'three_kind': None, 'four_kind': None, 'full_house': None,
-        'small_straight': None, 'large_straight': None,
-        'yahtzee': None, 'chance': None,
-    }
-    category_names = {
-        'ones': 'Ones', 'twos': 'Twos', 'threes': 'Threes',
-        'fours': 'Fours', 'fives': 'Fives', 'sixes': 'Sixes',
-        'three_kind': 'Three of a Kind', 'four_kind': 'Four of a Kind',
-        'full_house': 'Full House', 'small_straight': 'Small Straight',
-        'large_straight': 'Large Straight', 'yahtzee': 'YAHTZEE!', 'chance': 'Chance',
-    }
+    scorecard = Scorecard()
+    rng, record = start_game('yahtzee', rng)
+    category_names = YAHTZEE_NAMES
     def show_scorecard():
         print("\n" + "=" * 60)
         print("SCORECARD")
         print("=" * 60)
         print("\nUPPER SECTION:")
-        for i, cat in enumerate(['ones','twos','threes','fours','fives','sixes'], 1):
+        for i, cat in enumerate(YAHTZEE_UPPER, 1):
             score = scorecard[cat]
             display = f"{score:3d}" if score is not None else " - "
             print(f"  {i}. {category_names[cat]:20s} {display}")
-        upper_total = sum(s for s in [scorecard[c] for c in ['ones','twos','threes','fours','fives','sixes']] if s is not None)
-        upper_bonus = 35 if upper_total >= 63 else 0
-        print(f"\n     Upper Total: {upper_total}")
-        if upper_total >= 63:
-            print(f"     Bonus (63+): +{upper_bonus}")
+        print(f"\n     Upper Total: {scorecard.upper_total}")
+        if scorecard.upper_bonus:
+            print(f"     Bonus (63+): +{scorecard.upper_bonus}")
         print("\nLOWER SECTION:")
-        for i, cat in enumerate(['three_kind','four_kind','full_house','small_straight','large_straight','yahtzee','chance'], 7):
+        for i, cat in enumerate(YAHTZEE_LOWER, 7):
             score = scorecard[cat]
             display = f"{score:3d}" if score is not None else " - "
             print(f"  {i}. {category_names[cat]:20s} {display}")
-        lower_total = sum(s for s in [scorecard[c] for c in ['three_kind','four_kind','full_house','small_straight','large_straight','yahtzee','chance']] if s is not None)
-        print(f"\n     Lower Total: {lower_total}")
-        grand_total = upper_total + upper_bonus + lower_total
-        print(f"     GRAND TOTAL: {grand_total}")
+        print(f"\n     Lower Total: {scorecard.lower_total}")
+        print(f"     GRAND TOTAL: {scorecard.grand_total}")
         print("=" * 60)
-    def count_values(dice):
-        counts = {}
-        for die in dice:
-            val = dice_value(die)
-            counts[val] = counts.get(val, 0) + 1
-        return counts
-    def calculate_score(dice, category):
-        values = [dice_value(d) for d in dice]
-        counts = count_values(dice)
-        if category in ['ones','twos','threes','fours','fives','sixes']:
-            target = ['ones','twos','threes','fours','fives','sixes'].index(category) + 1
-            return values.count(target) * target
-        if category == 'three_kind':
-            return sum(values) if any(c >= 3 for c in counts.values()) else 0
-        if category == 'four_kind':
-            return sum(values) if any(c >= 4 for c in counts.values()) else 0
-        if category == 'full_house':
-            return 25 if sorted(counts.values()) == [2, 3] else 0
-        if category == 'small_straight':
-            unique = sorted(set(values))
-            for i in range(len(unique) - 3):
-                if unique[i:i+4] == list(range(unique[i], unique[i]+4)):
-                    return 30
-            return 0
-        if category == 'large_straight':
-            unique = sorted(set(values))
-            return 40 if unique in [[1,2,3,4,5],[2,3,4,5,6]] else 0
-        if category == 'yahtzee':
-            return 50 if any(c == 5 for c in counts.values()) else 0
-        if category == 'chance':
-            return sum(values)
-        return 0
     def show_available_scores(dice):
         print("\nAVAILABLE CATEGORIES:")
         available = []
-        for cat, score in scorecard.items():
-            if score is None:
-                potential = calculate_score(dice, cat)
-                cat_num = list(scorecard.keys()).index(cat) + 1
-                print(f"  {cat_num}. {category_names[cat]:20s} = {potential:3d} points")
-                available.append(cat_num)
+        potentials = yahtzee_scores(dice)
+        for cat_id in scorecard.open_ids():
+            cat_num = cat_id + 1
+            print(f"  {cat_num}. {category_names[YAHTZEE_CATEGORIES[cat_id]]:20s} = {potentials[cat_id]:3d} points")
+            available.append(cat_num)
         return available
-    for round_num in range(1, 14):
-        print("\n" + "=" * 60)
+    def show_hint(dice, rolls_left=0):
+        from emodice_solver import get_solver, hold_positions, scorecard_state
+        solver = get_solver()
+        if solver is None:
+            print("No up-to-date strategy table - run: python3 emodice_solver.py")
+            return
+        mask, up = scorecard_state(scorecard)
+        current = scorecard.grand_total
+        if rolls_left:
+            kept, value = solver.best_hold(dice, rolls_left, mask, up)
+            if len(kept) == 5:
+                advice = "keep all"
+            elif kept:
+                advice = "keep " + " ".join(str(i + 1) for i in hold_positions(dice, kept))
+            else:
+                advice = "reroll everything"
+        else:
+            cat, value = solver.best_category(dice, mask, up)
+            advice = f"score {category_names[cat]}"
+        print(f"💡 Hint: {advice} (expected final score {current + value:.1f})")
+    # When the screen can redraw in place, each roll and the category choice
+    # is a fresh frame, so only the dice and changed scorecard rows are sent.
+    def show_round(round_num, note=""):
+        clear_screen()
+        print("=" * 60)
         print(f"ROUND {round_num}/13")
         print("=" * 60)
         show_scorecard()
-        dice = roll_dice(5)
+        if note:
+            print(note)
+    for round_num in range(1, 14):
+        dice = roll_dice(5, rng=rng)
         kept_dice = []
+        note = ""
         for roll_num in range(1, 4):
+            if roll_num == 1 or can_redraw():
+                show_round(round_num, note)
+            elif note:
+                print(note)
+            note = ""
             print(f"\n--- Roll {roll_num}/3 ---")
+            record.roll(dice)
             if kept_dice:
-                print(f"Kept: {' '.join(kept_dice)}")
+                print(f"Kept: {dice_str(kept_dice)}")
             display_dice(dice, "Current roll:")
             if roll_num < 3:
-                keep = input("\nKeep dice? (e.g., '1 3 5' or 'all' or press ENTER to reroll all): ").strip().lower()
+                keep = ask("\nKeep dice? (e.g., '1 3 5', 'all', 'hint' or press ENTER to reroll all): ").strip().lower()
+                while keep == 'hint':
+                    show_hint(dice, 3 - roll_num)
+                    keep = ask("Keep dice? ").strip().lower()
                 if keep == 'all':
+                    record.choose(*hold_trace(range(len(dice))))
                     kept_dice = dice[:]
                     break
                 elif keep:
                     try:
                         indices = [int(x) - 1 for x in keep.split()]
-                        kept_dice = [dice[i] for i in indices if 0 <= i < len(dice)]
+                        indices = [i for i in indices if 0 <= i < len(dice)]
+                        record.choose(*hold_trace(indices))
+                        kept_dice = bytes(dice[i] for i in indices)
                         num_reroll = 5 - len(kept_dice)
                         if num_reroll > 0:
-                            new_dice = roll_dice(num_reroll)
+                            new_dice = roll_dice(num_reroll, rng=rng)
                             dice = kept_dice + new_dice
                             kept_dice = []
                         else:
                             dice = kept_dice
                             break
                     except (ValueError, IndexError):
-                        print("Invalid input, rerolling all")
-                        dice = roll_dice(5)
+                        note = "Invalid input, rerolling all"
+                        record.choose(*hold_trace([]))
+                        dice = roll_dice(5, rng=rng)
                 else:
-                    dice = roll_dice(5)
-        print("\n" + "=" * 60)
+                    record.choose(*hold_trace([]))
+                    dice = roll_dice(5, rng=rng)
+        if can_redraw():
+            show_round(round_num)
+        else:
+            print("\n" + "=" * 60)
         display_dice(dice, "FINAL DICE:")
         available = show_available_scores(dice)
         while True:
             try:
-                choice = int(input("\nChoose category to score (1-13): "))
+                choice = ask("\nChoose category to score (1-13 or 'hint'): ").strip().lower()
+                if choice == 'hint':
+                    show_hint(dice)
+                    continue
+                choice = int(choice)
                 if choice in available:
-                    cat_key = list(scorecard.keys())[choice - 1]
-                    score = calculate_score(dice, cat_key)
-                    scorecard[cat_key] = score
+                    cat_key = YAHTZEE_CATEGORIES[choice - 1]
+                    record.choose(choice - 1)
+                    score = yahtzee_score(dice, cat_key)
+                    scorecard.fill(cat_key, score)
                     print(f"\n✓ Scored {score} points in {category_names[cat_key]}")
                     break
                 else:
@@ -204,16 +835,14 @@ def game_yahtzee():
             except (ValueError, IndexError):
                 print("Please enter a number 1-13")
         if round_num < 13:
-            input("\nPress ENTER for next round...")
+            ask("\nPress ENTER for next round...")
     clear_screen()
     print("\n" + "=" * 60)
     print("GAME OVER!")
     print("=" * 60)
     show_scorecard()
-    upper_total = sum(s for s in [scorecard[c] for c in ['ones','twos','threes','fours','fives','sixes']] if s is not None)
-    upper_bonus = 35 if upper_total >= 63 else 0
-    lower_total = sum(s for s in [scorecard[c] for c in ['three_kind','four_kind','full_house','small_straight','large_straight','yahtzee','chance']] if s is not None)
-    grand_total = upper_total + upper_bonus + lower_total
+    grand_total = scorecard.grand_total
+    record.finish(grand_total)
     print(f"\n🏆 FINAL SCORE: {grand_total} points")
     if grand_total >= 300:
         print("🌟 EXCELLENT! You're a Yahtzee master!")
@@ -228,14 +857,14 @@ def game_yahtzee():
 # ============================================================
 # GAME 2: HIGHEST WINS
 # ============================================================
-def game_highest_wins():
+def game_highest_wins(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 2: HIGHEST WINS")
     print("=" * 60)
     print("\nTwo players each roll dice. Highest total wins!")
     try:
-        count = int(input(f"\nDice per player (1-{MAX_DICE//2})? "))
+        count = int(ask(f"\nDice per player (1-{MAX_DICE//2})? "))
         if count < 1 or count > MAX_DICE//2:
             print(f"ERROR: Must be between 1 and {MAX_DICE//2}")
             press_enter()
@@ -244,20 +873,28 @@ def game_highest_wins():
         print("ERROR: Please enter a valid number!")
         press_enter()
         return
-    input("\nPlayer 1 - Press ENTER to roll...")
-    p1_dice = roll_dice(count)
+    rng, record = start_game('highest_wins', rng)
+    rng = dice_source(rng)
+    record.choose(count)
+    p1_rng, p2_rng = rng.spawn('player1'), rng.spawn('player2')
+    ask("\nPlayer 1 - Press ENTER to roll...")
+    p1_dice = roll_dice(count, rng=p1_rng)
+    record.roll(p1_dice)
     display_dice(p1_dice, "Player 1:")
     p1_total = sum_dice(p1_dice)
     print(f"Player 1 Total: {p1_total}")
-    input("\nPlayer 2 - Press ENTER to roll...")
-    p2_dice = roll_dice(count)
+    ask("\nPlayer 2 - Press ENTER to roll...")
+    p2_dice = roll_dice(count, rng=p2_rng)
+    record.roll(p2_dice)
     display_dice(p2_dice, "Player 2:")
     p2_total = sum_dice(p2_dice)
     print(f"Player 2 Total: {p2_total}")
     print("\n" + "=" * 60)
-    if p1_total > p2_total:
+    winner = compare_totals(p1_total, p2_total)
+    record.finish(p1_total, ['draw', 'win', 'loss'][winner])
+    if winner == 1:
         print(f"🏆 PLAYER 1 WINS! ({p1_total} vs {p2_total})")
-    elif p2_total > p1_total:
+    elif winner == 2:
         print(f"🏆 PLAYER 2 WINS! ({p2_total} vs {p1_total})")
     else:
         print(f"🤝 TIE GAME! (Both scored {p1_total})")
@@ -267,77 +904,104 @@ def game_highest_wins():
 # ============================================================
 # GAME 3: TARGET NUMBER
 # ============================================================
-def game_target_number():
+def game_target_number(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 3: TARGET NUMBER")
     print("=" * 60)
     print("\nTry to roll exactly the target number!")
     try:
-        count = int(input(f"\nHow many dice (1-{MAX_DICE})? "))
-        if count < 1 or count > MAX_DICE:
-            print(f"ERROR: Must be between 1 and {MAX_DICE}")
+        count = int(ask(f"\nHow many dice (1-{MAX_DICE}, or up to {POOL_MAX:,} as a pool)? "))
+        if count < 1 or count > POOL_MAX:
+            print(f"ERROR: Must be between 1 and {POOL_MAX:,}")
             press_enter()
             return
-        target = int(input(f"Target number ({count}-{count*6})? "))
+        target = int(ask(f"Target number ({count:,}-{count*6:,})? "))
         if target < count or target > count * 6:
-            print(f"ERROR: Target must be between {count} and {count*6}")
+            print(f"ERROR: Target must be between {count:,} and {count*6:,}")
             press_enter()
             return
     except ValueError:
         print("ERROR: Please enter a valid number!")
         press_enter()
         return
-    max_attempts = 10
-    print(f"\nTarget: {target}")
-    print(f"You have {max_attempts} attempts!\n")
+    max_attempts = TARGET_ATTEMPTS
+    odds = None
+    if count <= TARGET_ODDS_DICE:
+        from emodice_odds import sum_table
+        odds = sum_table(count)
+    print(f"\nTarget: {target:,}")
+    print(f"You have {max_attempts} attempts!")
+    if odds is not None:
+        print(f"Odds: {float(odds.probability(target)):.2%} per roll, "
+              f"{odds.hit_within(target, max_attempts):.1%} within {max_attempts} attempts")
+    print()
+    rng, record = start_game('target_number', rng)
+    record.choose(count, target)
     for attempt in range(1, max_attempts + 1):
-        input(f"Attempt {attempt}/{max_attempts} - Press ENTER to roll...")
-        dice = roll_dice(count)
+        left = ""
+        if odds is not None and attempt > 1:
+            left = f" ({odds.hit_within(target, max_attempts - attempt + 1):.1%} chance left)"
+        ask(f"Attempt {attempt}/{max_attempts}{left} - Press ENTER to roll...")
+        dice = roll_count(count, rng=rng)
+        record.roll(dice)
         display_dice(dice)
-        total = sum_dice(dice)
+        total = dice_total(dice)
         diff = abs(total - target)
-        print(f"Total: {total} (off by {diff})")
+        print(f"Total: {total:,} (off by {diff:,})")
         if total == target:
-            print(f"\n🎯 BULLSEYE! You hit {target} in {attempt} attempt(s)!")
+            record.finish(attempt, 'hit')
+            print(f"\n🎯 BULLSEYE! You hit {target:,} in {attempt} attempt(s)!")
             break
         elif diff <= 2:
             print("🔥 So close!")
     else:
-        print(f"\n💔 Out of attempts! Target was {target}")
+        record.finish(None, 'miss')
+        print(f"\n💔 Out of attempts! Target was {target:,}")
     press_enter()
 
 # ============================================================
 # GAME 4: SKULL SURVIVAL
 # ============================================================
-def game_skull_survival():
+def game_skull_survival(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 4: SKULL SURVIVAL")
     print("=" * 60)
     print("\nRoll dice with skulls (☠). Three skulls = GAME OVER!")
     print("Try to get the highest score before busting!")
-    dice_count = 5
+    dice_count = SKULL_SURVIVAL_DICE
     score = 0
     skulls = 0
     round_num = 1
+    rng, record = start_game('skull_survival', rng)
     print(f"\nStarting with {dice_count} dice")
-    while skulls < 3:
+    while skulls < SKULL_LIMIT:
         print(f"\n--- Round {round_num} ---")
         print(f"Score: {score} | Skulls: {'☠' * skulls}")
-        choice = input("Roll dice? (y/n or 'quit'): ").lower()
+        choice = ask("Roll dice? (y/n, 'hint' or 'quit'): ").lower()
+        while choice == 'hint':
+            from emodice_skulls import solve
+            solution = solve()
+            advice = "roll" if solution.should_roll(score, skulls) else "stop"
+            print(f"💡 Hint: {advice} (expected final score {solution.value(score, skulls):.1f})")
+            choice = ask("Roll dice? ").lower()
         if choice in ('n', 'no', 'quit', 'q'):
+            record.choose(round_num - 1)
+            record.finish(score, 'stop')
             print(f"\n✋ Stopped with score: {score}")
             break
-        dice = roll_dice(dice_count, include_skull=True)
+        dice = roll_dice(dice_count, include_skull=True, rng=rng)
+        record.roll(dice)
         display_dice(dice)
-        round_skulls = dice.count("☠")
+        round_skulls = dice.count(SKULL)
         round_score = sum_dice(dice)
-        skulls += round_skulls
-        score += round_score
+        score, skulls = skull_survival_step(score, skulls, dice)
         if round_skulls > 0:
             print(f"⚠️  {round_skulls} skull(s) this round!")
-        if skulls >= 3:
+        if skulls >= SKULL_LIMIT:
+            record.choose(round_num)
+            record.finish(score, 'bust')
             print(f"\n💀 THREE SKULLS! GAME OVER!")
             print(f"Final Score: {score}")
             break
@@ -348,7 +1012,7 @@ def game_skull_survival():
 # ============================================================
 # GAME 5: DOUBLES
 # ============================================================
-def game_doubles():
+def game_doubles(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 5: DOUBLES (PAIRS)")
@@ -359,31 +1023,25 @@ def game_doubles():
     print("  • Four of a kind = 25 points")
     print("  • Five of a kind = 50 points")
     print("  • Six of a kind = 100 points")
-    input("\nPress ENTER to roll 6 dice...")
-    dice = roll_dice(6)
+    ask("\nPress ENTER to roll 6 dice...")
+    rng, record = start_game('doubles', rng)
+    dice = roll_dice(6, rng=rng)
     display_dice(dice, "Your roll:")
-    counts = {}
-    for die in dice:
-        value = dice_value(die)
-        counts[value] = counts.get(value, 0) + 1
-    score = 0
+    score = score_doubles(dice)
+    record.roll(dice)
+    record.finish(score)
     matches = []
-    for value, count in counts.items():
+    for value, count in count_values(dice).items():
         face = DICE_FACES_STANDARD[value - 1]
         if count == 2:
-            score += 2
             matches.append(f"Pair of {face} = 2 points")
         elif count == 3:
-            score += 10
             matches.append(f"Three {face}'s = 10 points")
         elif count == 4:
-            score += 25
             matches.append(f"Four {face}'s = 25 points")
         elif count == 5:
-            score += 50
             matches.append(f"Five {face}'s = 50 points")
         elif count == 6:
-            score += 100
             matches.append(f"Six {face}'s = 100 points!")
     print("\n--- Scoring ---")
     if matches:
@@ -397,7 +1055,7 @@ def game_doubles():
 # ============================================================
 # GAME 6: SEQUENCES
 # ============================================================
-def game_sequences():
+def game_sequences(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 6: SEQUENCES")
@@ -407,33 +1065,20 @@ def game_sequences():
     print("  • 4 in a row (e.g., ⚂⚃⚄⚅) = 50 points")
     print("  • 5 in a row = 100 points")
     print("  • Full sequence (⚀⚁⚂⚃⚄⚅) = 200 points!")
-    input("\nPress ENTER to roll 6 dice...")
-    dice = roll_dice(6)
+    ask("\nPress ENTER to roll 6 dice...")
+    rng, record = start_game('sequences', rng)
+    dice = roll_dice(6, rng=rng)
     display_dice(dice, "Your roll:")
-    values = sorted([dice_value(d) for d in dice])
-    max_seq = 1
-    current_seq = 1
-    for i in range(1, len(values)):
-        if values[i] == values[i-1] + 1:
-            current_seq += 1
-            max_seq = max(max_seq, current_seq)
-        elif values[i] != values[i-1]:
-            current_seq = 1
-    if values == [1, 2, 3, 4, 5, 6]:
-        score = 200
-        result = "FULL SEQUENCE! ⚀⚁⚂⚃⚄⚅"
-    elif max_seq >= 5:
-        score = 100
-        result = "5 in a row!"
-    elif max_seq >= 4:
-        score = 50
-        result = "4 in a row!"
-    elif max_seq >= 3:
-        score = 20
-        result = "3 in a row"
-    else:
-        score = 0
-        result = "No sequence"
+    score = score_sequences(dice)
+    record.roll(dice)
+    record.finish(score)
+    result = {
+        200: "FULL SEQUENCE! ⚀⚁⚂⚃⚄⚅",
+        100: "5 in a row!",
+        50: "4 in a row!",
+        20: "3 in a row",
+        0: "No sequence",
+    }[score]
     print(f"\n🎯 {result}")
     print(f"🏆 Score: {score} points")
     press_enter()
@@ -441,97 +1086,429 @@ def game_sequences():
 # ============================================================
 # GAME 7: BEAT THE HOUSE
 # ============================================================
-def game_beat_the_house():
+def game_beat_the_house(rng=None):
     clear_screen()
     print("=" * 60)
     print("GAME 7: BEAT THE HOUSE")
     print("=" * 60)
     print("\nBest of 3 rounds against the computer!")
     print("Highest total each round wins.")
-    dice_count = 5
+    rng, record = start_game('beat_the_house', rng)
+    rng = dice_source(rng)
+    player_rng, house_rng = rng.spawn('player'), rng.spawn('house')
+    dice_count = HOUSE_DICE
     player_wins = 0
     house_wins = 0
-    for round_num in range(1, 4):
+    for round_num in range(1, HOUSE_ROUNDS + 1):
         print(f"\n{'='*60}")
         print(f"ROUND {round_num}")
         print(f"Score: You {player_wins} - House {house_wins}")
         print(f"{'='*60}")
-        input("\nPress ENTER to roll your dice...")
-        player_dice = roll_dice(dice_count)
+        ask("\nPress ENTER to roll your dice...")
+        player_dice = roll_dice(dice_count, rng=player_rng)
+        record.roll(player_dice)
         display_dice(player_dice, "Your roll:")
         player_total = sum_dice(player_dice)
         print(f"Your total: {player_total}")
         print("\n🎰 House is rolling...")
-        time.sleep(1)
-        house_dice = roll_dice(dice_count)
+        pause(1)
+        house_dice = roll_dice(dice_count, rng=house_rng)
+        record.roll(house_dice)
         display_dice(house_dice, "House roll:")
         house_total = sum_dice(house_dice)
         print(f"House total: {house_total}")
-        if player_total > house_total:
+        winner = compare_totals(player_total, house_total)
+        if winner == 1:
             print(f"\n✓ You win round {round_num}!")
             player_wins += 1
-        elif house_total > player_total:
+        elif winner == 2:
             print(f"\n✗ House wins round {round_num}")
             house_wins += 1
         else:
             print(f"\n🤝 Round {round_num} is a tie (no points)")
-        if player_wins == 2:
-            print(f"\n🏆 YOU WIN THE MATCH! (2-{house_wins})")
+        if house_match_over(player_wins, house_wins):
+            if player_wins == HOUSE_WINS_NEEDED:
+                print(f"\n🏆 YOU WIN THE MATCH! (2-{house_wins})")
+            else:
+                print(f"\n💔 HOUSE WINS THE MATCH ({player_wins}-2)")
             break
-        elif house_wins == 2:
-            print(f"\n💔 HOUSE WINS THE MATCH ({player_wins}-2)")
-            break
-        if round_num < 3:
-            time.sleep(1)
+        if round_num < HOUSE_ROUNDS:
+            pause(1)
+    record.finish(player_wins, house_outcome(player_wins, house_wins))
     press_enter()
 
+# ============================================================
+# GAME REGISTRY
+# ============================================================
+# Menu entries in menu order, by CLI name. A game's target is "module:function",
+# imported only when the game is played, so a game's dependencies cost
+# nothing until it is chosen; a bare function name is looked up in this
+# module at play time. Other packages add games through the 'emodice.games'
+# entry point group: the entry point name is the CLI name and its object
+# the game function, called with no arguments.
+PLUGIN_GROUP = 'emodice.games'
+GAMES = {}
+
+class GameInfo:
+    __slots__ = ('name', 'title', 'blurb', 'target')
+
+    def __init__(self, name, title, blurb, target):
+        self.name = name
+        self.title = title
+        self.blurb = blurb
+        self.target = target
+
+    def menu_line(self, number):
+        return f"  {number}. {self.title:19s} - {self.blurb}"
+
+    # target is an entry point value, module:attr with a dotted attribute
+    # path (extras in brackets are ignored), or a function in this module.
+    def load(self):
+        module, _, path = self.target.split('[')[0].strip().rpartition(':')
+        obj = importlib.import_module(module) if module else sys.modules[__name__]
+        for attr in path.split('.'):
+            obj = getattr(obj, attr)
+        return obj
+
+def register_game(name, title, blurb, target):
+    GAMES[name] = GameInfo(name, title, blurb, target)
+    return GAMES[name]
+
+register_game('simple_roller', "Simple Roller", "Just roll some dice", 'game_simple_roller')
+register_game('highest_wins', "Highest Wins", "Two players compete", 'game_highest_wins')
+register_game('target_number', "Target Number", "Hit the exact target", 'game_target_number')
+register_game('skull_survival', "Skull Survival", "Don't get 3 skulls!", 'game_skull_survival')
+register_game('doubles', "Doubles (Pairs)", "Match dice for points", 'game_doubles')
+register_game('sequences', "Sequences", "Roll consecutive numbers", 'game_sequences')
+register_game('beat_the_house', "Beat the House", "Play vs computer", 'game_beat_the_house')
+register_game('yahtzee', "Yahtzee", "Classic Yahtzee scorecard", 'game_yahtzee')
+
+_discovered = False
+
+# Registers games from installed packages. Only their metadata is read; a
+# plugin's code is imported when its game is first played.
+def discover_games():
+    global _discovered
+    if _discovered:
+        return
+    _discovered = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return
+    found = entry_points()
+    found = found.select(group=PLUGIN_GROUP) if hasattr(found, 'select') else found.get(PLUGIN_GROUP, [])
+    for entry in found:
+        if entry.name not in GAMES:
+            dist = getattr(entry, 'dist', None)
+            blurb = f"From {dist.name}" if dist is not None else "Plugin game"
+            register_game(entry.name, entry.name.replace('_', ' ').title(), blurb, entry.value)
+
+def find_game(name):
+    if name not in GAMES:
+        discover_games()
+    try:
+        return GAMES[name]
+    except KeyError:
+        raise ValueError(f"Unknown game: {name!r}") from None
+
+def play_game(game):
+    try:
+        play = game.load()
+    except (ImportError, AttributeError) as e:
+        print(f"\n❌ Could not load {game.title}: {e}")
+        press_enter()
+        return
+    play()
+
 # ============================================================
 # MAIN MENU
 # ============================================================
-def show_menu():
+def show_menu(games):
     clear_screen()
     print("=" * 60)
     print("🎲  EMOJI DICE GAMES COLLECTION  🎲")
     print("=" * 60)
     print("\nSelect a game:\n")
-    print("  1. Simple Roller       - Just roll some dice")
-    print("  2. Highest Wins        - Two players compete")
-    print("  3. Target Number       - Hit the exact target")
-    print("  4. Skull Survival      - Don't get 3 skulls!")
-    print("  5. Doubles (Pairs)     - Match dice for points")
-    print("  6. Sequences           - Roll consecutive numbers")
-    print("  7. Beat the House      - Play vs computer")
-    print("  8. Yahtzee             - Classic Yahtzee scorecard")
+    for number, game in enumerate(games, 1):
+        print(game.menu_line(number))
     print("\n  0. Quit")
+    source = dice_source()
+    if source.name != 'secure':
+        print(f"\n  Replay this session with: --rng {source.name} --seed {source.seed}")
     print("\n" + "=" * 60)
 
-def main():
-    games = {
-        '1': game_simple_roller,
-        '2': game_highest_wins,
-        '3': game_target_number,
-        '4': game_skull_survival,
-        '5': game_doubles,
-        '6': game_sequences,
-        '7': game_beat_the_house,
-        '8': game_yahtzee,
-    }
+def run_menu():
+    discover_games()
+    games = list(GAMES.values())
     while True:
-        show_menu()
-        choice = input("Enter your choice (0-8): ").strip()
+        show_menu(games)
+        choice = ask(f"Enter your choice (0-{len(games)}): ").strip()
         if choice == '0':
             clear_screen()
             print("\n👋 Thanks for playing! Goodbye!\n")
             sys.exit(0)
-        if choice in games:
-            games[choice]()
+        if choice.isdigit() and 1 <= int(choice) <= len(games):
+            play_game(games[int(choice) - 1])
+        else:
+            print(f"\n❌ Invalid choice! Please enter 0-{len(games)}")
+            pause(1)
+
+# ============================================================
+# COMMAND LINE
+# ============================================================
+OUTPUT_FORMATS = ['text', 'json', 'ndjson', 'csv']
+
+def _flatten(record, prefix=""):
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, list):
+            flat[prefix + str(key)] = " ".join(str(v) for v in value)
+        else:
+            flat[prefix + str(key)] = value
+    return flat
+
+# Streams records to stdout as they are produced: a JSON array, one JSON
+# object per line, CSV rows (header taken from the first record) or
+# key=value text.
+class RecordWriter:
+    def __init__(self, fmt, stream=None):
+        self.fmt = fmt
+        self.stream = stream or sys.stdout
+        self.count = 0
+        self.csv = None
+
+    def write(self, record):
+        if self.fmt == 'json':
+            self.stream.write(("[\n" if not self.count else ",\n") + json.dumps(record))
+        elif self.fmt == 'ndjson':
+            self.stream.write(json.dumps(record) + "\n")
+        elif self.fmt == 'csv':
+            flat = _flatten(record)
+            if self.csv is None:
+                self.csv = csv.DictWriter(self.stream, fieldnames=list(flat), lineterminator="\n")
+                self.csv.writeheader()
+            self.csv.writerow(flat)
+        else:
+            self.stream.write(" ".join(f"{k}={v}" for k, v in _flatten(record).items()) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.fmt == 'json':
+            self.stream.write("\n]\n" if self.count else "[]\n")
+        self.stream.flush()
+
+def cli_roll(args, writer):
+    rng = make_dice(args.rng, args.seed)
+    if args.count > MAX_DICE:
+        cli_roll_pools(args, writer, rng)
+        return
+    done = 0
+    while done < args.iterations:
+        size = min(4096, args.iterations - done)
+        block = roll_many(size, args.count, args.skull, rng)
+        for start in range(0, len(block), args.count):
+            dice = block[start:start + args.count]
+            done += 1
+            if args.format == 'text':
+                writer.stream.write(f"{dice_str(dice)}  = {sum_dice(dice)}\n")
+            else:
+                writer.write({'roll': done, 'dice': list(dice), 'total': sum_dice(dice)})
+
+# Rolls above MAX_DICE dice are reported as face counts, indexed by code.
+def cli_roll_pools(args, writer, rng):
+    for done in range(1, args.iterations + 1):
+        pool = roll_pool(args.count, args.skull, rng)
+        if args.format == 'text':
+            writer.stream.write(f"{pool}  = {pool.total}\n")
+        else:
+            writer.write({'roll': done, 'counts': list(pool.counts), 'total': pool.total})
+
+def cli_simulate(args, writer):
+    from emodice_sim import SkullThreshold, simulate_parallel
+    options = {}
+    if args.game in ('simple_roller', 'highest_wins', 'target_number') and args.count is not None:
+        options['count'] = args.count
+    if args.game == 'simple_roller':
+        options['include_skull'] = args.skull
+    if args.game == 'target_number' and args.target is not None:
+        options['target'] = args.target
+    policy = None
+    if args.game == 'skull_survival' and args.policy == 'optimal':
+        from emodice_skulls import solve
+        policy = solve()
+    elif args.game == 'skull_survival':
+        policy = SkullThreshold(args.threshold)
+    elif args.game == 'yahtzee':
+        policy = _yahtzee_policy(args.policy)
+    result = simulate_parallel(args.game, args.iterations, seed=args.seed, workers=args.workers,
+                               policy=policy, backend=args.rng, **options)
+    writer.write(result.summary())
+
+def _yahtzee_policy(name):
+    if name == 'optimal':
+        from emodice_solver import OptimalYahtzeePolicy, get_solver
+        solver = get_solver()
+        if solver is None:
+            raise SystemExit("Yahtzee strategy table missing or out of date; run: python3 emodice_solver.py")
+        return OptimalYahtzeePolicy(solver)
+    from emodice_sim import GreedyYahtzeePolicy
+    return GreedyYahtzeePolicy()
+
+def cli_yahtzee(args, writer):
+    from emodice_sim import DiceStream, play_yahtzee
+    policy = _yahtzee_policy(args.policy)
+    stream = DiceStream(make_dice(args.rng, args.seed))
+    for i in range(args.iterations):
+        scorecard = play_yahtzee(policy, stream)
+        writer.write({'game': i + 1, 'score': scorecard.grand_total,
+                      'upper_total': scorecard.upper_total, 'upper_bonus': scorecard.upper_bonus,
+                      'lower_total': scorecard.lower_total, 'scorecard': scorecard.as_dict()})
+
+# Built-in games only; plugin games have no simulator.
+SIM_GAMES = list(GAMES)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="emodice", description="Emoji dice games. Run without a command for the interactive menu.")
+    parser.add_argument('--no-delay', action='store_true', help="skip pauses in interactive games")
+    parser.add_argument('--plain', action='store_true', help="no cursor control, even on a terminal")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="count and time rolls, scoring, rendering and input per game; "
+                             "written on exit as JSON (*.json) or Prometheus text")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="profile the run; a pstats dump for *.prof, a text report otherwise")
+    parser.add_argument('--profiler', choices=['cprofile', 'sample'], default='cprofile',
+                        help="sample: collapsed stacks for flamegraphs instead of cProfile")
+    parser.add_argument('--rng', dest='session_rng', choices=list(DICE_BACKENDS), default='mt',
+                        help="RNG backend for interactive play (default mt)")
+    parser.add_argument('--seed', dest='session_seed', type=int, default=None,
+                        help="seed for interactive play, to replay a session")
+    parser.add_argument('--history', nargs='?', const='', default=None, metavar='PATH',
+                        help="record interactive games to a history database (default ~/.cache/emodice)")
+    parser.add_argument('--player', default=PLAYER, help="player name for the history (default player)")
+    parser.add_argument('--trace', nargs='?', const='', default=None, metavar='PATH',
+                        help="append a replay trace of every interactive game (default ~/.cache/emodice)")
+    commands = parser.add_subparsers(dest='command')
+
+    def add_common(cmd, iterations):
+        cmd.add_argument('--seed', type=int, default=None, help="RNG seed for reproducible output")
+        cmd.add_argument('--iterations', '-n', type=int, default=iterations,
+                         help=f"number of rolls/games (default {iterations})")
+        cmd.add_argument('--format', '-f', choices=OUTPUT_FORMATS, default='text')
+        cmd.add_argument('--rng', choices=list(DICE_BACKENDS), default='mt', help="RNG backend (default mt)")
+
+    roll = commands.add_parser('roll', help="roll dice")
+    roll.add_argument('--count', '-c', type=int, default=2, help=f"dice per roll (default 2; above {MAX_DICE} reported as face counts)")
+    roll.add_argument('--skull', action='store_true', help="include the skull face")
+    add_common(roll, 1)
+    roll.set_defaults(func=cli_roll)
+
+    sim = commands.add_parser('simulate', help="simulate a game headlessly and print statistics")
+    sim.add_argument('game', choices=SIM_GAMES)
+    sim.add_argument('--count', '-c', type=int, default=None, help="dice per roll where the game allows it")
+    sim.add_argument('--skull', action='store_true', help="include the skull face (simple_roller)")
+    sim.add_argument('--target', type=int, default=None, help="target total (target_number)")
+    sim.add_argument('--threshold', type=int, default=25, help="stop score (skull_survival, default 25)")
+    sim.add_argument('--policy', choices=['greedy', 'optimal'], default='greedy',
+                     help="Yahtzee player; optimal also replaces --threshold in skull_survival")
+    sim.add_argument('--workers', '-j', type=int, default=1, help="worker processes (default 1)")
+    add_common(sim, 100000)
+    sim.set_defaults(func=cli_simulate)
+
+    yahtzee = commands.add_parser('yahtzee', help="play Yahtzee games with a bot, one record per game")
+    yahtzee.add_argument('--policy', choices=['greedy', 'optimal'], default='greedy')
+    add_common(yahtzee, 1)
+    yahtzee.set_defaults(func=cli_yahtzee)
+
+    play = commands.add_parser('play', help="play one game interactively, skipping the menu")
+    play.add_argument('game', help=f"game to play: {', '.join(GAMES)}, or an installed plugin game")
+    return parser
+
+def run_command(args):
+    writer = RecordWriter(args.format)
+    try:
+        args.func(args, writer)
+    except ImportError as e:
+        raise SystemExit(f"{args.rng} backend unavailable: {e}")
+    writer.close()
+
+def run_interactive(args):
+    global HISTORY, PLAYER, SCREEN, TRACES
+    if args.trace is not None and args.session_rng == 'secure':
+        raise SystemExit("--trace needs a seeded --rng; secure sessions cannot be replayed")
+    if args.command == 'play':
+        try:
+            game = find_game(args.game)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    set_default_dice(make_dice(args.session_rng, args.session_seed))
+    if args.history is not None:
+        from emodice_history import HISTORY_PATH, HistoryStore
+        HISTORY = HistoryStore(args.history or HISTORY_PATH)
+        PLAYER = args.player
+    if args.trace is not None:
+        from emodice_replay import TRACE_PATH, TraceLog
+        TRACES = TraceLog(args.trace or TRACE_PATH)
+    SCREEN = Screen(sys.stdout, ansi=False if args.plain else None)
+    sys.stdout = SCREEN
+    try:
+        if args.command == 'play':
+            play_game(game)
+        else:
+            run_menu()
+    finally:
+        sys.stdout = SCREEN.stream
+        SCREEN.flush()
+        SCREEN = None
+        if HISTORY is not None:
+            HISTORY.close()
+        if TRACES is not None:
+            TRACES.close()
+
+def main(argv=None):
+    global DELAYS
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in ('roll', 'simulate') and args.count is not None and args.count < 1:
+        parser.error("--count must be at least 1")
+    if getattr(args, 'iterations', 0) < 0:
+        parser.error("--iterations cannot be negative")
+    interactive = args.command in (None, 'play')
+    backend = args.session_rng if interactive else args.rng
+    seed = args.session_seed if interactive else args.seed
+    if seed is not None:
+        # Backends differ in the seeds they take (NumPy's reject negatives).
+        try:
+            make_dice(backend, seed)
+        except ImportError:
+            pass
+        except ValueError as e:
+            parser.error(f"--seed {seed} is not valid for --rng {backend}: {e}")
+    DELAYS = not args.no_delay
+    run = run_interactive if args.command in (None, 'play') else run_command
+    if not (args.metrics or args.profile):
+        run(args)
+        return
+    import emodice_metrics
+    metrics = emodice_metrics.enable() if args.metrics else None
+    try:
+        if args.profile:
+            emodice_metrics.capture(run, args, path=args.profile, sample=args.profiler == 'sample')
         else:
-            print("\n❌ Invalid choice! Please enter 0-8")
-            time.sleep(1)
+            run(args)
+    finally:
+        if metrics is not None:
+            metrics.write(args.metrics)
+            emodice_metrics.disable()
 
 if __name__ == "__main__":
     try:
         main()
+    except BrokenPipeError:
+        sys.stderr.close()
     except KeyboardInterrupt:
         print("\n\n👋 Game interrupted. Goodbye!\n")
         sys.exit(0)
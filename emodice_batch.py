@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+emodice_batch.py - Batch Yahtzee scoring for emodice
+https://github.com/D1A881/emodice
+
+score_rolls turns a block of N five-dice rolls into an N x 13 score matrix
+(columns in YAHTZEE_CATEGORIES order). NumPy is used when it is installed;
+otherwise rows are served from a table of all 7776 ordered rolls built from
+yahtzee_scores' face-count histogram.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from emodice import YAHTZEE_CATEGORIES, yahtzee_scores
+
+N_CATEGORIES = len(YAHTZEE_CATEGORIES)
+_ROWS = {}
+
+def _row(roll):
+    row = _ROWS.get(roll)
+    if row is None:
+        row = _ROWS[roll] = tuple(yahtzee_scores(roll))
+    return row
+
+def score_rolls_python(rolls):
+    if isinstance(rolls, (bytes, bytearray)):
+        rolls = [bytes(rolls[i:i + 5]) for i in range(0, len(rolls), 5)]
+    return [_row(bytes(roll)) for roll in rolls]
+
+def score_rolls_numpy(rolls):
+    if isinstance(rolls, (bytes, bytearray)):
+        rolls = np.frombuffer(bytes(rolls), dtype=np.uint8).reshape(-1, 5)
+    elif isinstance(rolls, (list, tuple)) and rolls and isinstance(rolls[0], (bytes, bytearray)):
+        rolls = np.frombuffer(b"".join(rolls), dtype=np.uint8).reshape(-1, 5)
+    rolls = np.asarray(rolls, dtype=np.int16).reshape(-1, 5)
+    counts = np.stack([(rolls == face).sum(axis=1) for face in range(1, 7)], axis=1)
+    total = rolls.sum(axis=1)
+    most = counts.max(axis=1)
+    present = counts > 0
+    p1, p2, p3, p4, p5, p6 = (present[:, i] for i in range(6))
+    small = (p1 & p2 & p3 & p4) | (p2 & p3 & p4 & p5) | (p3 & p4 & p5 & p6)
+    large = (most == 1) & ~(p1 & p6)
+    scores = np.empty((len(rolls), N_CATEGORIES), dtype=np.int16)
+    scores[:, :6] = counts * np.arange(1, 7, dtype=np.int16)
+    scores[:, 6] = np.where(most >= 3, total, 0)
+    scores[:, 7] = np.where(most >= 4, total, 0)
+    scores[:, 8] = np.where((counts == 3).any(axis=1) & (counts == 2).any(axis=1), 25, 0)
+    scores[:, 9] = np.where(small, 30, 0)
+    scores[:, 10] = np.where(large, 40, 0)
+    scores[:, 11] = np.where(most == 5, 50, 0)
+    scores[:, 12] = total
+    return scores
+
+# Accepts an (N, 5) array, a list of 5-dice rolls (bytes as from roll_dice,
+# or sequences of face codes), or a flat roll_many block of N * 5 face codes. Returns an (N, 13) int16 array with NumPy, or a list
+# of N 13-tuples without it.
+def score_rolls(rolls):
+    if np is not None:
+        return score_rolls_numpy(rolls)
+    return score_rolls_python(rolls)
+
+# The same scores as one list of plain ints per category, in
+# YAHTZEE_CATEGORIES order.
+def score_columns(rolls):
+    scores = score_rolls(rolls)
+    if np is not None:
+        return scores.T.tolist()
+    return [list(column) for column in zip(*scores)]
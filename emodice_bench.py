@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+emodice_bench.py - Benchmarks for the emodice hot paths
+https://github.com/D1A881/emodice
+
+    python3 -m emodice_bench                          # run everything, JSON to stdout
+    python3 -m emodice_bench --save-baseline base.json
+    python3 -m emodice_bench --baseline base.json     # exit 1 on regressions
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from emodice import (
+    MAX_DICE, YAHTZEE_CATEGORIES, dice_value, make_dice, roll_dice, roll_many,
+    roll_pool, score_doubles, score_sequences, sum_dice, yahtzee_score, yahtzee_scores,
+)
+from emodice_batch import score_rolls
+
+PERCENTILES = (50, 90, 99)
+DEFAULT_THRESHOLD = 1.10
+SIM_GAMES = {
+    'simple_roller': 10000, 'highest_wins': 10000, 'target_number': 2000,
+    'skull_survival': 2000, 'doubles': 10000, 'sequences': 10000,
+    'beat_the_house': 2000, 'yahtzee': 50,
+}
+
+# ============================================================
+# TIMING
+# ============================================================
+# Calls fn in batches sized to take roughly target seconds each and returns
+# the per-call time in nanoseconds of every batch.
+def measure(fn, repeat=15, target=0.01):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(target / elapsed) + 1))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1e9)
+    return samples
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def summarize(samples, ops=1):
+    per_op = [s / ops for s in samples]
+    result = {'unit': 'ns/op', 'mean': sum(per_op) / len(per_op)}
+    for p in PERCENTILES:
+        result[f'p{p}'] = percentile(per_op, p)
+    result['ops_per_sec'] = 1e9 / result['p50'] if result['p50'] else None
+    return result
+
+# ============================================================
+# CASES
+# ============================================================
+# Each case is (name, fn, ops): fn performs ops operations per call.
+def cases():
+    dice = make_dice('mt', 1)
+    five = roll_dice(5, rng=dice)
+    six = roll_dice(6, rng=dice)
+    for n in range(1, MAX_DICE + 1):
+        yield f'roll_dice[{n}]', (lambda n=n: roll_dice(n, rng=dice)), 1
+    yield 'roll_many[1000x5]', lambda: roll_many(1000, 5, rng=dice), 1000
+    for n in (10 ** 3, 10 ** 6, 10 ** 9):
+        yield f'roll_pool[{n}]', (lambda n=n: roll_pool(n, rng=dice)), 1
+    yield 'dice_value', lambda: dice_value(five[0]), 1
+    yield 'sum_dice[5]', lambda: sum_dice(five), 1
+    yield 'sum_dice[28]', (lambda d=roll_dice(MAX_DICE, rng=dice): sum_dice(d)), 1
+    for cat in YAHTZEE_CATEGORIES:
+        yield f'yahtzee_score[{cat}]', (lambda cat=cat: yahtzee_score(five, cat)), 1
+    yield 'yahtzee_scores', lambda: yahtzee_scores(five), 1
+    block = [roll_dice(5, rng=dice) for _ in range(1000)]
+    yield 'score_rolls[1000]', lambda: score_rolls(block), 1000
+    yield 'score_doubles', lambda: score_doubles(six), 1
+    yield 'score_sequences', lambda: score_sequences(six), 1
+
+def game_cases():
+    from emodice_sim import simulate
+    for game, n in SIM_GAMES.items():
+        yield f'games[{game}]', (lambda game=game, n=n: simulate(game, n, seed=1)), n
+
+def run(name_filter=None, quick=False):
+    repeat = 5 if quick else 15
+    results = {}
+    for name, fn, ops in list(cases()) + list(game_cases()):
+        if name_filter and name_filter not in name:
+            continue
+        is_game = name.startswith('games[')
+        samples = measure(fn, repeat=3 if quick and is_game else repeat,
+                          target=0.05 if is_game else 0.01)
+        results[name] = summarize(samples, ops)
+    return results
+
+# ============================================================
+# BASELINES
+# ============================================================
+# Cases whose median got slower than baseline * threshold.
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or not old.get('p50'):
+            continue
+        ratio = result['p50'] / old['p50']
+        if ratio > threshold:
+            regressions.append({'name': name, 'baseline_p50': old['p50'],
+                                'p50': result['p50'], 'ratio': round(ratio, 3)})
+    return regressions
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f).get('results', {})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emodice_bench", description="Benchmark emodice hot paths.")
+    parser.add_argument('--filter', '-k', help="only run cases whose name contains this text")
+    parser.add_argument('--quick', action='store_true', help="fewer repeats, for a fast check")
+    parser.add_argument('--baseline', help="compare against this saved report")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"slowdown ratio flagged as a regression (default {DEFAULT_THRESHOLD})")
+    parser.add_argument('--save-baseline', metavar='PATH', help="also write the report to PATH")
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'results': run(args.filter, args.quick),
+    }
+    if args.baseline:
+        report['regressions'] = compare(report['results'], load_baseline(args.baseline), args.threshold)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(text + "\n")
+    if report.get('regressions'):
+        for r in report['regressions']:
+            print(f"REGRESSION {r['name']}: {r['ratio']}x slower", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+emodice_history.py - Persistent game history and stats for emodice
+https://github.com/D1A881/emodice
+
+Games and their rolls are kept in a local SQLite database. Writes are
+buffered in memory and committed in batches, and a per (game, player)
+rollup table is updated with each batch, so stats such as best score,
+average score and win rate are answered from a handful of rows instead of
+scanning every game.
+
+    python3 emodice_history.py [--db PATH] stats [--player NAME]
+    python3 emodice_history.py [--db PATH] top yahtzee
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from emodice_odds import CACHE_DIR
+
+HISTORY_PATH = os.path.join(CACHE_DIR, 'history.sqlite3')
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2.0
+WIN_OUTCOMES = ('win', 'hit')
+LOSS_OUTCOMES = ('loss', 'bust', 'miss')
+# Games scored in attempts, where the lowest score is the best. Games without
+# a score (a Target Number miss) count towards games played but not towards
+# averages or bests.
+LOWER_IS_BETTER = ('target_number',)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,
+    player TEXT NOT NULL,
+    seed TEXT,
+    score INTEGER,
+    outcome TEXT,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS rolls (
+    game_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    dice BLOB NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (game_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    game TEXT NOT NULL,
+    player TEXT NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    scored INTEGER NOT NULL DEFAULT 0,
+    total_score INTEGER NOT NULL DEFAULT 0,
+    best_score INTEGER,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (game, player)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS games_by_game_score ON games (game, score DESC);
+CREATE INDEX IF NOT EXISTS games_by_player ON games (player, game, finished);
+CREATE INDEX IF NOT EXISTS games_by_time ON games (finished);
+"""
+
+def _better(game):
+    return min if game in LOWER_IS_BETTER else max
+
+# Handle for one game in progress; rolls and the result are buffered in the
+# store until its next flush. game_id is assigned by SQLite when the game is
+# first written, so several processes can share one database.
+class GameRecord:
+    __slots__ = ('store', 'game_id', 'game', 'player', 'seed', 'score', 'outcome',
+                 'started', 'finished', 'rolls')
+
+    def __init__(self, store, game, player, seed):
+        self.store = store
+        self.game_id = None
+        self.game = game
+        self.player = player
+        self.seed = seed
+        self.score = self.outcome = self.finished = None
+        self.started = time.time()
+        self.rolls = 0
+
+    def roll(self, dice):
+        self.store._pending_rolls.append((self, self.rolls, bytes(dice), time.time()))
+        self.rolls += 1
+        self.store._maybe_flush()
+
+    # Choices are not stored here; replay traces (emodice_replay) keep them.
+    def choose(self, *values):
+        pass
+
+    def finish(self, score, outcome=None):
+        self.store._finish(self, score, outcome)
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._pending_games = []
+        self._pending_rolls = []
+        self._last_flush = time.monotonic()
+
+    # ---- writes ----
+    # Seeds are unsigned 64-bit and do not fit an SQLite INTEGER, so they are
+    # stored as decimal text.
+    def game(self, game, player='player', seed=None):
+        record = GameRecord(self, game, player, None if seed is None else str(seed))
+        self._pending_games.append(record)
+        return record
+
+    def _finish(self, record, score, outcome):
+        record.score, record.outcome, record.finished = score, outcome, time.time()
+        # Not buffered any more once its start was written: queue the update.
+        if record.game_id is not None:
+            self._pending_games.append(record)
+        self._maybe_flush()
+
+    def _pending(self):
+        return len(self._pending_games) + len(self._pending_rolls)
+
+    def _maybe_flush(self):
+        if (self._pending() >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    # Commits everything buffered in one transaction. New games are inserted
+    # and take their id from SQLite; games still in progress are written
+    # without a result and completed by an update in a later flush.
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending():
+            return
+        games, rolls = self._pending_games, self._pending_rolls
+        self._pending_games, self._pending_rolls = [], []
+        with self.db:
+            for record in games:
+                if record.game_id is None:
+                    record.game_id = self.db.execute(
+                        "INSERT INTO games (game, player, seed, score, outcome, started, finished)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (record.game, record.player, record.seed, record.score, record.outcome,
+                         record.started, record.finished)).lastrowid
+                else:
+                    self.db.execute("UPDATE games SET score = ?, outcome = ?, finished = ? WHERE id = ?",
+                                    (record.score, record.outcome, record.finished, record.game_id))
+            self.db.executemany("INSERT INTO rolls VALUES (?, ?, ?, ?)",
+                                [(record.game_id, seq, dice, ts) for record, seq, dice, ts in rolls])
+            self._update_rollups([record for record in games if record.finished is not None])
+
+    def _update_rollups(self, finished):
+        totals = {}
+        for record in finished:
+            score = record.score
+            entry = totals.setdefault((record.game, record.player), [0, 0, 0, None, 0, 0])
+            entry[0] += 1
+            if score is not None:
+                entry[1] += 1
+                entry[2] += score
+                entry[3] = score if entry[3] is None else _better(record.game)(entry[3], score)
+            entry[4] += record.outcome in WIN_OUTCOMES
+            entry[5] += record.outcome in LOSS_OUTCOMES
+        for (game, player), (games, scored, total, best, wins, losses) in totals.items():
+            better = 'MIN' if game in LOWER_IS_BETTER else 'MAX'
+            self.db.execute("INSERT OR IGNORE INTO rollups (game, player) VALUES (?, ?)", (game, player))
+            self.db.execute(
+                "UPDATE rollups SET games = games + ?, scored = scored + ?, total_score = total_score + ?,"
+                f" best_score = CASE WHEN best_score IS NULL THEN ? WHEN ? IS NULL THEN best_score"
+                f" ELSE {better}(best_score, ?) END,"
+                " wins = wins + ?, losses = losses + ? WHERE game = ? AND player = ?",
+                (games, scored, total, best, best, best, wins, losses, game, player))
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    # ---- queries ----
+    # Per-game totals summed over the matching rollup rows: {game: (games,
+    # scored, total, best, wins, losses)}.
+    def _rollups(self, game=None, player=None):
+        sql = "SELECT game, games, scored, total_score, best_score, wins, losses FROM rollups"
+        clauses, args = [], []
+        for column, value in (('game', game), ('player', player)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        totals = {}
+        for name, games, scored, total, best, wins, losses in self.db.execute(sql, args):
+            entry = totals.setdefault(name, [0, 0, 0, None, 0, 0])
+            entry[0] += games
+            entry[1] += scored
+            entry[2] += total
+            if best is not None:
+                entry[3] = best if entry[3] is None else _better(name)(entry[3], best)
+            entry[4] += wins
+            entry[5] += losses
+        return totals
+
+    def _rollup(self, game, player=None):
+        return self._rollups(game, player).get(game, [0, 0, 0, None, 0, 0])
+
+    # Lowest for games scored in attempts, highest otherwise.
+    def best_score(self, game, player=None):
+        self.flush()
+        return self._rollup(game, player)[3]
+
+    # Mean over games that have a score.
+    def average_score(self, game, player=None):
+        self.flush()
+        _, scored, total = self._rollup(game, player)[:3]
+        return total / scored if scored else None
+
+    def win_rate(self, game, player=None):
+        self.flush()
+        games, _, _, _, wins, _ = self._rollup(game, player)
+        return wins / games if games else None
+
+    def stats(self, player=None):
+        self.flush()
+        result = {}
+        for game, (games, scored, total, best, wins, losses) in sorted(self._rollups(player=player).items()):
+            result[game] = {'games': games, 'average': total / scored if scored else None,
+                            'best': best, 'wins': wins, 'losses': losses,
+                            'win_rate': wins / games if games else None}
+        return result
+
+    def leaderboard(self, game, limit=10):
+        self.flush()
+        order = 'ASC' if game in LOWER_IS_BETTER else 'DESC'
+        rows = self.db.execute(
+            "SELECT player, score, finished FROM games WHERE game = ? AND score IS NOT NULL"
+            f" ORDER BY score {order} LIMIT ?", (game, limit))
+        return [{'player': p, 'score': s, 'finished': f} for p, s, f in rows]
+
+    def rolls(self, game_id):
+        self.flush()
+        return [dice for (dice,) in self.db.execute(
+            "SELECT dice FROM rolls WHERE game_id = ? ORDER BY seq", (game_id,))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emodice_history", description="Query emodice game history.")
+    parser.add_argument('--db', default=HISTORY_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats = commands.add_parser('stats', help="per-game stats")
+    stats.add_argument('--player')
+    top = commands.add_parser('top', help="best scores for a game")
+    top.add_argument('game')
+    top.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+    store = HistoryStore(args.db)
+    if args.command == 'stats':
+        print(json.dumps(store.stats(args.player), indent=2))
+    else:
+        print(json.dumps(store.leaderboard(args.game, args.limit), indent=2))
+    store.close()
+
+if __name__ == "__main__":
+    main()
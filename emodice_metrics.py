@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+emodice_metrics.py - Opt-in instrumentation and profiling for emodice
+https://github.com/D1A881/emodice
+
+enable() swaps the hot functions (rolling, summing, scoring, rendering and
+input) for wrappers that count calls and time them per game; disable() puts
+the originals back. Nothing is wrapped until enable() is called, so runs
+without metrics pay nothing. Times are inclusive: a roll_dice call also
+counts its dice source draw under 'dice'. Op 'game' times each game entry
+point: an interactive game, a simulator batch or a server request.
+
+    metrics = enable()
+    simulate('yahtzee', 100, seed=1)
+    metrics.write('metrics.prom')     # or .json
+    disable()
+
+Simulations sharded over worker processes collect counters in each worker
+and merge them into the parent's (collect() and Metrics.merge()).
+
+capture() runs any callable (a game_* function, a simulation) under cProfile
+or a stack-sampling profiler.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Module-level functions timed as op name.
+FUNCTION_OPS = {
+    'roll_dice': 'roll_dice',
+    'roll_many': 'roll_many',
+    'roll_pool': 'roll_pool',
+    'sum_dice': 'sum_dice',
+    'yahtzee_score': 'score',
+    'yahtzee_scores': 'score',
+    'score_doubles': 'score',
+    'score_sequences': 'score',
+    'ask': 'input',
+}
+# (class, method, op) timed on the class, so every instance is covered.
+METHOD_OPS = [
+    ('DiceSource', 'faces', 'dice'),
+    ('DiceSource', 'pool', 'dice'),
+    ('Screen', 'flush', 'render'),
+]
+
+class Metrics:
+    def __init__(self):
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.game = None
+        self.started = time.time()
+
+    def reset(self):
+        self.calls.clear()
+        self.seconds.clear()
+
+    def timed(self, op, fn):
+        calls, seconds, clock = self.calls, self.seconds, time.perf_counter
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                key = (op, self.game)
+                calls[key] += 1
+                seconds[key] += clock() - start
+        return wrapper
+
+    # Runs fn with the game label set (a name, or a function of the first
+    # argument for methods) and times the whole call as op 'game'.
+    def labelled(self, label, fn):
+        timed = self.timed('game', fn)
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            previous = self.game
+            self.game = label(args[0]) if callable(label) else label
+            try:
+                return timed(*args, **kwargs)
+            finally:
+                self.game = previous
+        return wrapper
+
+    # Copies the counters; retried because another thread (the server's
+    # event loop) may be updating them.
+    def _items(self):
+        while True:
+            try:
+                return list(self.calls.items()), dict(self.seconds)
+            except RuntimeError:
+                continue
+
+    # Raw counters, picklable, for a worker process to send back to merge().
+    def counts(self):
+        return self._items()
+
+    def merge(self, counts):
+        calls, seconds = counts
+        self.calls.update(dict(calls))
+        self.seconds.update(seconds)
+        return self
+
+    def snapshot(self):
+        calls, seconds = self._items()
+        ops = [{'op': op, 'game': game, 'calls': n, 'seconds': seconds.get((op, game), 0.0)}
+               for (op, game), n in sorted(calls, key=lambda kv: (kv[0][0], kv[0][1] or ''))]
+        return {'started': self.started, 'uptime': time.time() - self.started, 'ops': ops}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        ops = self.snapshot()['ops']
+        lines = []
+        for name, field, kind, help_text in (
+                ('emodice_calls_total', 'calls', 'counter', "Instrumented calls."),
+                ('emodice_seconds_total', 'seconds', 'counter', "Time spent in instrumented calls.")):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for entry in ops:
+                labels = f'op="{entry["op"]}",game="{entry["game"] or ""}"'
+                lines.append(f"{name}{{{labels}}} {entry[field]}")
+        return "\n".join(lines) + "\n"
+
+    # Writes JSON for *.json paths and Prometheus text otherwise.
+    def write(self, path):
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        with open(path, 'w') as f:
+            f.write(text)
+
+    # Serves /metrics (Prometheus) and /metrics.json from a daemon thread.
+    def serve(self, host='127.0.0.1', port=9108):
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, kind = metrics.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, kind = metrics.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+# ============================================================
+# INSTALLING
+# ============================================================
+_ACTIVE = None
+_PATCHES = []
+
+# The loaded copies of emodice.py: the module, plus __main__ when the game
+# is run as a script (it is then imported a second time by the other modules).
+def _core_modules():
+    import emodice
+    modules = [emodice]
+    main = sys.modules.get('__main__')
+    if main is not emodice and os.path.basename(getattr(main, '__file__', '') or '') == 'emodice.py':
+        modules.append(main)
+    return modules
+
+def _emodice_modules():
+    return [m for name, m in list(sys.modules.items())
+            if m is not None and (name.startswith('emodice') or name == '__main__')]
+
+# Replaces original with wrapper on owner and anywhere it was imported by
+# name into another emodice module.
+def _patch(owner, name, wrapper):
+    if isinstance(owner, dict):
+        original = owner[name]
+        owner[name] = wrapper
+        _PATCHES.append((owner, name, original))
+        return
+    original = vars(owner)[name]
+    setattr(owner, name, wrapper)
+    _PATCHES.append((owner, name, original))
+    if isinstance(owner, type):
+        return
+    for module in _emodice_modules():
+        if module is not owner:
+            for attr, value in list(vars(module).items()):
+                if value is original:
+                    setattr(module, attr, wrapper)
+                    _PATCHES.append((module, attr, original))
+
+def enable(metrics=None):
+    global _ACTIVE
+    if _ACTIVE is not None:
+        return _ACTIVE
+    metrics = _ACTIVE = metrics or Metrics()
+    import emodice_sim
+    for module in _core_modules():
+        for name, op in FUNCTION_OPS.items():
+            if name in vars(module):
+                _patch(module, name, metrics.timed(op, vars(module)[name]))
+        for cls, method, op in METHOD_OPS:
+            owner = vars(module).get(cls)
+            if owner is not None:
+                _patch(owner, method, metrics.timed(op, vars(owner)[method]))
+        for name in [n for n in vars(module) if n.startswith('game_')]:
+            _patch(module, name, metrics.labelled(name[len('game_'):], vars(module)[name]))
+    for game, fn in list(emodice_sim.SIMULATORS.items()):
+        _patch(emodice_sim.SIMULATORS, game, metrics.labelled(game, fn))
+    # Server sessions, from emodice_server or __main__ when it runs as a script.
+    sessions = {id(c): c for c in (vars(m).get('GameSession') for m in _emodice_modules())
+                if isinstance(c, type) and 'handle' in vars(c)}
+    for cls in sessions.values():
+        _patch(cls, 'handle', metrics.labelled(lambda session: session.game, vars(cls)['handle']))
+    return metrics
+
+def disable():
+    global _ACTIVE
+    while _PATCHES:
+        owner, name, original = _PATCHES.pop()
+        if isinstance(owner, dict):
+            owner[name] = original
+        else:
+            setattr(owner, name, original)
+    metrics, _ACTIVE = _ACTIVE, None
+    return metrics
+
+def active():
+    return _ACTIVE
+
+# Runs fn(*args, **kwargs) in a worker process with metrics enabled and
+# returns (result, counts) for the parent's Metrics.merge(). A forked worker
+# inherits the parent's counters, so they are cleared first; counts cover
+# this call only.
+def collect(fn, *args, **kwargs):
+    metrics = enable()
+    metrics.reset()
+    result = fn(*args, **kwargs)
+    return result, metrics.counts()
+
+# ============================================================
+# PROFILING
+# ============================================================
+# Samples one thread's Python stack every interval seconds from a background
+# thread. Results are collapsed stacks ("outer;inner count"), the input
+# format of flamegraph tools.
+class Sampler:
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+def _report(profiler, path, top):
+    if isinstance(profiler, Sampler):
+        report = profiler.collapsed()
+    elif path and path.endswith('.prof'):
+        profiler.dump_stats(path)
+        return
+    else:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+        report = out.getvalue()
+    if path:
+        with open(path, 'w') as f:
+            f.write(report)
+    else:
+        sys.stderr.write(report)
+
+# Calls fn(*args, **kwargs) under a profiler and returns its result. With
+# sample=True the stacks are sampled, otherwise cProfile is used. The report
+# goes to path (a pstats dump for *.prof, text otherwise) or to stderr, and
+# is written even if fn raises.
+def capture(fn, *args, path=None, sample=False, top=30, **kwargs):
+    profiler = Sampler() if sample else cProfile.Profile()
+    try:
+        if sample:
+            with profiler:
+                return fn(*args, **kwargs)
+        return profiler.runcall(fn, *args, **kwargs)
+    finally:
+        _report(profiler, path, top)
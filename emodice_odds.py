@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+emodice_odds.py - Exact odds and expected values for the emodice scoring rules
+https://github.com/D1A881/emodice
+
+    python3 emodice_odds.py target COUNT TARGET [--attempts 10] [--chance 0.5 0.9]
+"""
+
+import argparse
+import json
+import math
+import os
+from collections import Counter
+from fractions import Fraction
+from itertools import combinations_with_replacement
+
+from emodice import (
+    MAX_DICE, TARGET_ATTEMPTS, YAHTZEE_CATEGORIES, score_doubles, score_sequences, yahtzee_score,
+)
+
+# Bump whenever a scoring rule changes so stale disk caches are rebuilt.
+ODDS_VERSION = 1
+CACHE_DIR = os.environ.get('EMODICE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'emodice'))
+ODDS_CACHE = os.path.join(CACHE_DIR, 'odds.json')
+
+# The order of dice never matters to a score, so a roll is identified by its
+# signature: the face codes in sorted order. 5 dice have 252 signatures and
+# 6 dice 462, instead of 7776 and 46656 ordered outcomes.
+def signature(dice):
+    return bytes(sorted(dice))
+
+def signatures(n_dice):
+    return [bytes(s) for s in combinations_with_replacement(range(1, 7), n_dice)]
+
+# Number of ordered outcomes (out of 6**n) that produce a signature.
+def outcome_count(sig):
+    ways = math.factorial(len(sig))
+    for n in Counter(sig).values():
+        ways //= math.factorial(n)
+    return ways
+
+def _yahtzee_rule(category):
+    def rule(dice):
+        return yahtzee_score(dice, category)
+    return rule
+
+# name -> (dice rolled, scoring rule)
+RULES = {'doubles': (6, score_doubles), 'sequences': (6, score_sequences)}
+for _cat in YAHTZEE_CATEGORIES:
+    RULES[f'yahtzee.{_cat}'] = (5, _yahtzee_rule(_cat))
+
+# ============================================================
+# TABLES
+# ============================================================
+# Score of every signature for one rule, plus the exact score distribution
+# as outcome counts over 6**n_dice.
+class OddsTable:
+    def __init__(self, name, n_dice, scores):
+        self.name = name
+        self.n_dice = n_dice
+        self.scores = scores
+        self.outcomes = 6 ** n_dice
+        self.distribution = Counter()
+        for sig, score in scores.items():
+            self.distribution[score] += outcome_count(sig)
+
+    def score(self, dice):
+        return self.scores[signature(dice)]
+
+    def probability(self, score):
+        return Fraction(self.distribution.get(score, 0), self.outcomes)
+
+    def at_least(self, score):
+        return Fraction(sum(n for s, n in self.distribution.items() if s >= score), self.outcomes)
+
+    def expected(self):
+        return Fraction(sum(s * n for s, n in self.distribution.items()), self.outcomes)
+
+    def probabilities(self):
+        return {s: n / self.outcomes for s, n in sorted(self.distribution.items())}
+
+def build_tables():
+    tables = {}
+    for name, (n_dice, rule) in RULES.items():
+        tables[name] = OddsTable(name, n_dice, {sig: rule(sig) for sig in signatures(n_dice)})
+    return tables
+
+def save_tables(tables, path=ODDS_CACHE):
+    data = {
+        'version': ODDS_VERSION,
+        'tables': {
+            name: {'dice': t.n_dice, 'scores': {sig.hex(): s for sig, s in t.scores.items()}}
+            for name, t in tables.items()
+        },
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+# Returns None if the cache is missing, unreadable or from another version.
+def load_tables(path=ODDS_CACHE):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != ODDS_VERSION or set(data.get('tables', ())) != set(RULES):
+        return None
+    return {
+        name: OddsTable(name, t['dice'], {bytes.fromhex(k): s for k, s in t['scores'].items()})
+        for name, t in data['tables'].items()
+    }
+
+_TABLES = None
+
+# Tables are built once, cached on disk and then served from memory.
+def tables(path=ODDS_CACHE):
+    global _TABLES
+    if _TABLES is None:
+        _TABLES = load_tables(path)
+        if _TABLES is None:
+            _TABLES = build_tables()
+            try:
+                save_tables(_TABLES, path)
+            except OSError:
+                pass
+    return _TABLES
+
+def table(name):
+    try:
+        return tables()[name]
+    except KeyError:
+        raise ValueError(f"Unknown scoring rule: {name!r}") from None
+
+def yahtzee_table(category):
+    return table(f'yahtzee.{category}')
+
+# ============================================================
+# SUMS
+# ============================================================
+# Exact distribution of the total of n dice, as outcome counts indexed by
+# total, built one die at a time by convolving with a single die. Every
+# count on the way up to MAX_DICE is kept; larger counts are built on from
+# the nearest table already made and kept individually.
+# Exact tables are big-integer work that grows faster than n squared: 1000
+# dice take a couple of seconds, 5000 a few minutes.
+MAX_SUM_DICE = 1000
+_SUM_CHAINS = {False: [[1]], True: [[1]]}
+_SUM_LARGE = {}
+
+def _add_die(counts, lowest):
+    prefix = [0]
+    for n in counts:
+        prefix.append(prefix[-1] + n)
+    size = len(counts)
+    return [prefix[min(t - lowest + 1, size)] - prefix[max(t - 6, 0)] if t >= lowest else 0
+            for t in range(size + 6)]
+
+def _sum_counts(n_dice, include_skull):
+    lowest = 0 if include_skull else 1
+    chain = _SUM_CHAINS[include_skull]
+    while len(chain) <= min(n_dice, MAX_DICE):
+        chain.append(_add_die(chain[-1], lowest))
+    if n_dice < len(chain):
+        return chain[n_dice]
+    key = (n_dice, include_skull)
+    if key not in _SUM_LARGE:
+        start = max([n for n, skull in _SUM_LARGE if skull == include_skull and n < n_dice],
+                    default=MAX_DICE)
+        counts = _SUM_LARGE[start, include_skull] if start > MAX_DICE else chain[MAX_DICE]
+        for _ in range(n_dice - start):
+            counts = _add_die(counts, lowest)
+        _SUM_LARGE[key] = counts
+    return _SUM_LARGE[key]
+
+# Odds for Target Number-style play: rolling n dice repeatedly until the
+# total hits a target. Each query is a lookup and a little arithmetic.
+class SumTable:
+    def __init__(self, n_dice, include_skull=False):
+        self.n_dice = n_dice
+        self.include_skull = include_skull
+        self.counts = _sum_counts(n_dice, include_skull)
+        self.outcomes = (7 if include_skull else 6) ** n_dice
+
+    def _count(self, total):
+        return self.counts[total] if 0 <= total < len(self.counts) else 0
+
+    # Exact chance of rolling total.
+    def probability(self, total):
+        return Fraction(self._count(total), self.outcomes)
+
+    # The remaining queries are floats: exact powers of the per-roll chance
+    # grow too large to compute for long odds. Chances below float range
+    # become 0.0.
+    def _p(self, total):
+        return self._count(total) / self.outcomes
+
+    # Chance of rolling the target at least once in attempts rolls.
+    def hit_within(self, target, attempts=TARGET_ATTEMPTS):
+        p = self._p(target)
+        if p >= 1.0:
+            return 1.0
+        return -math.expm1(attempts * math.log1p(-p))
+
+    # Mean number of rolls a game takes when it stops at a hit or after
+    # attempts rolls (attempts=None: no limit, None if the target is impossible).
+    def expected_attempts(self, target, attempts=TARGET_ATTEMPTS):
+        count = self._count(target)
+        if attempts is None:
+            if not count:
+                return None
+            try:
+                return self.outcomes / count
+            except OverflowError:
+                return math.inf
+        p = count / self.outcomes
+        if not p:
+            return float(attempts)
+        return self.hit_within(target, attempts) / p
+
+    # Fewest attempts that give at least the chance of a hit, or None if no
+    # number of attempts does.
+    def attempts_for(self, target, chance):
+        count = self._count(target)
+        if chance <= 0:
+            return 0
+        if count == self.outcomes:
+            return 1
+        if not count or chance >= 1:
+            return None
+        p = count / self.outcomes
+        if p > 1e-12:
+            attempts = math.ceil(math.log1p(-chance) / math.log1p(-p))
+        else:
+            # log1p(-p) is -p to within float precision here; the exact count
+            # keeps this right when p itself is below float range.
+            attempts = math.ceil(Fraction(-math.log1p(-chance)) * self.outcomes / count)
+        return max(attempts, 1)
+
+    def expected(self):
+        return Fraction(sum(t * n for t, n in enumerate(self.counts)), self.outcomes)
+
+    # The likeliest total (the lower one when two tie).
+    def mode(self):
+        return max(range(len(self.counts)), key=lambda t: (self.counts[t], -t))
+
+    def probabilities(self):
+        return {t: n / self.outcomes for t, n in enumerate(self.counts) if n}
+
+_SUM_TABLES = {}
+
+def sum_table(n_dice, include_skull=False):
+    if not 1 <= n_dice <= MAX_SUM_DICE:
+        raise ValueError(f"Need 1 to {MAX_SUM_DICE} dice, got {n_dice}")
+    key = (n_dice, include_skull)
+    result = _SUM_TABLES.get(key)
+    if result is None:
+        result = _SUM_TABLES[key] = SumTable(n_dice, include_skull)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emodice_odds", description="Exact emodice odds.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    target = commands.add_parser('target', help="Target Number odds for COUNT dice")
+    target.add_argument('count', type=int)
+    target.add_argument('target', type=int)
+    target.add_argument('--attempts', type=int, default=TARGET_ATTEMPTS)
+    target.add_argument('--skull', action='store_true', help="dice include the skull face")
+    target.add_argument('--chance', type=float, nargs='*', default=[0.5, 0.9, 0.99],
+                        help="report the attempts needed for each chance of a hit")
+    args = parser.parse_args(argv)
+    if not 1 <= args.count <= MAX_SUM_DICE:
+        parser.error(f"COUNT must be between 1 and {MAX_SUM_DICE}")
+    if args.attempts < 1:
+        parser.error("--attempts must be at least 1")
+    if any(not 0 <= c <= 1 for c in args.chance):
+        parser.error("--chance values must be between 0 and 1")
+    odds = sum_table(args.count, args.skull)
+    expected = odds.expected_attempts(args.target, args.attempts)
+    print(json.dumps({
+        'dice': args.count, 'target': args.target, 'attempts': args.attempts,
+        'per_roll': float(odds.probability(args.target)),
+        'hit_within': odds.hit_within(args.target, args.attempts),
+        'expected_attempts': expected,
+        'attempts_for': {str(c): odds.attempts_for(args.target, c) for c in args.chance},
+        'best_target': odds.mode(),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+emodice_replay.py - Compact replay traces of interactive games
+https://github.com/D1A881/emodice
+
+A trace holds what is needed to play a game again and nothing more: the
+game, its dice backend and seed, the player's choices (dice counts, targets,
+Yahtzee holds and categories, how long Skull Survival went on) and the
+result the game reported. No dice are stored; replaying draws them again
+from the seed, so a Yahtzee game is about 50 bytes and a Doubles game 15.
+
+A trace file starts with MAGIC and then holds traces back to back, each
+prefixed with its length. Everything is an unsigned LEB128 varint:
+
+    game  backend  seed  score  outcome  choice...
+
+score is 0 for none, else the zigzag-encoded score plus 1; game, backend and
+outcome index TRACE_GAMES, TRACE_BACKENDS and OUTCOMES.
+
+    python3 emodice_replay.py show traces.edt --index 0
+    python3 emodice_replay.py verify traces.edt --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from emodice import (
+    HOUSE_DICE, HOUSE_ROUNDS, MAX_DICE, NO_RECORD, POOL_MAX, SKULL_LIMIT, SKULL_SURVIVAL_DICE,
+    TARGET_ATTEMPTS, TRACE_PREFETCH, YAHTZEE_CATEGORIES, Scorecard, compare_totals, dice_str,
+    dice_total, house_match_over, house_outcome, make_dice, roll_count, roll_dice, score_doubles,
+    score_sequences, skull_survival_step, sum_dice, yahtzee_score,
+)
+from emodice_odds import CACHE_DIR
+
+TRACE_PATH = os.path.join(CACHE_DIR, 'traces.edt')
+MAGIC = b'EDTR\x01'
+TRACE_GAMES = ['simple_roller', 'highest_wins', 'target_number', 'skull_survival',
+               'doubles', 'sequences', 'beat_the_house', 'yahtzee']
+TRACE_BACKENDS = ['mt', 'pcg64', 'philox']
+OUTCOMES = [None, 'win', 'loss', 'draw', 'hit', 'miss', 'stop', 'bust']
+# Traces per job handed to a verifier process.
+VERIFY_CHUNK = 20000
+
+class TraceError(ValueError):
+    pass
+
+# ============================================================
+# ENCODING
+# ============================================================
+def write_varint(out, n):
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+def read_varint(data, pos):
+    n = shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise TraceError("truncated varint") from None
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+def _zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+def _unzigzag(n):
+    return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+class Trace:
+    __slots__ = ('game', 'backend', 'seed', 'score', 'outcome', 'choices')
+
+    def __init__(self, game, backend, seed, score, outcome, choices):
+        self.game = game
+        self.backend = backend
+        self.seed = seed
+        self.score = score
+        self.outcome = outcome
+        self.choices = choices
+
+    def encode(self):
+        out = bytearray()
+        write_varint(out, TRACE_GAMES.index(self.game))
+        write_varint(out, TRACE_BACKENDS.index(self.backend))
+        write_varint(out, self.seed)
+        write_varint(out, 0 if self.score is None else _zigzag(self.score) + 1)
+        write_varint(out, OUTCOMES.index(self.outcome))
+        for value in self.choices:
+            write_varint(out, value)
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data):
+        values = []
+        n = shift = 0
+        for byte in data:
+            n |= (byte & 0x7f) << shift
+            if byte & 0x80:
+                shift += 7
+            else:
+                values.append(n)
+                n = shift = 0
+        if shift:
+            raise TraceError("truncated varint")
+        if len(values) < 5:
+            raise TraceError("trace too short")
+        game, backend, seed, score, outcome = values[:5]
+        try:
+            return cls(TRACE_GAMES[game], TRACE_BACKENDS[backend], seed,
+                       None if score == 0 else _unzigzag(score - 1), OUTCOMES[outcome], values[5:])
+        except IndexError:
+            raise TraceError("unknown game, backend or outcome") from None
+
+    def summary(self):
+        return {'game': self.game, 'backend': self.backend, 'seed': self.seed,
+                'score': self.score, 'outcome': self.outcome, 'choices': self.choices}
+
+# ============================================================
+# TRACE FILES
+# ============================================================
+# Records the choices of one traced game and appends its trace to the log
+# when it finishes. Rolls and the result are passed on to inner (the
+# history record, if any).
+class TraceRecord:
+    __slots__ = ('log', 'game', 'source', 'inner', 'choices')
+
+    def __init__(self, log, game, source, inner=NO_RECORD):
+        self.log = log
+        self.game = game
+        self.source = source
+        self.inner = inner
+        self.choices = []
+
+    def roll(self, dice):
+        self.inner.roll(dice)
+
+    def choose(self, *values):
+        self.choices.extend(int(v) for v in values)
+
+    def finish(self, score, outcome=None):
+        self.inner.finish(score, outcome)
+        self.log.write(Trace(self.game, self.source.name, self.source.seed, score, outcome, self.choices))
+
+# Appends traces to a file. Each finished game is written through at once,
+# so a session that crashes loses at most the game in progress.
+class TraceLog:
+    def __init__(self, path=TRACE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.count = 0
+
+    def game(self, game, source, inner=NO_RECORD):
+        if game not in TRACE_GAMES:
+            return inner
+        return TraceRecord(self, game, source, inner)
+
+    def write(self, trace):
+        body = trace.encode()
+        out = bytearray()
+        write_varint(out, len(body))
+        self.file.write(out + body)
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+# The raw trace bodies in a trace file's contents.
+def split_traces(data):
+    if not data.startswith(MAGIC):
+        raise TraceError("not a trace file")
+    bodies = []
+    pos = len(MAGIC)
+    while pos < len(data):
+        size, pos = read_varint(data, pos)
+        if pos + size > len(data):
+            raise TraceError(f"truncated trace at byte {pos}")
+        bodies.append(data[pos:pos + size])
+        pos += size
+    return bodies
+
+def read_traces(path):
+    with open(path, 'rb') as f:
+        return split_traces(f.read())
+
+# ============================================================
+# REPLAY
+# ============================================================
+# Each replayer makes the same dice calls as the interactive game, in the
+# same order and on the same sources, and returns (score, outcome).
+class _Choices:
+    def __init__(self, values):
+        self.values = values
+        self.pos = 0
+
+    def take(self, low, high):
+        if self.pos >= len(self.values):
+            raise TraceError("trace ends early")
+        value = self.values[self.pos]
+        self.pos += 1
+        if not low <= value <= high:
+            raise TraceError(f"choice {value} out of range {low}-{high}")
+        return value
+
+    def done(self):
+        return self.pos == len(self.values)
+
+def replay_simple_roller(rng, choices, record):
+    count = choices.take(1, POOL_MAX)
+    skull = choices.take(0, 1)
+    dice = roll_count(count, bool(skull), rng=rng)
+    record.roll(dice)
+    return dice_total(dice), None
+
+def replay_highest_wins(rng, choices, record):
+    count = choices.take(1, MAX_DICE // 2)
+    totals = []
+    for player_rng in (rng.spawn('player1'), rng.spawn('player2')):
+        dice = roll_dice(count, rng=player_rng)
+        record.roll(dice)
+        totals.append(sum_dice(dice))
+    return totals[0], ['draw', 'win', 'loss'][compare_totals(*totals)]
+
+def replay_target_number(rng, choices, record):
+    count = choices.take(1, POOL_MAX)
+    target = choices.take(count, count * 6)
+    for attempt in range(1, TARGET_ATTEMPTS + 1):
+        dice = roll_count(count, rng=rng)
+        record.roll(dice)
+        if dice_total(dice) == target:
+            return attempt, 'hit'
+    return None, 'miss'
+
+def replay_skull_survival(rng, choices, record):
+    rolls = choices.take(0, sys.maxsize)
+    score = skulls = 0
+    for _ in range(rolls):
+        if skulls >= SKULL_LIMIT:
+            raise TraceError("rolls after a bust")
+        dice = roll_dice(SKULL_SURVIVAL_DICE, include_skull=True, rng=rng)
+        record.roll(dice)
+        score, skulls = skull_survival_step(score, skulls, dice)
+    return score, 'bust' if skulls >= SKULL_LIMIT else 'stop'
+
+def replay_doubles(rng, choices, record):
+    dice = roll_dice(6, rng=rng)
+    record.roll(dice)
+    return score_doubles(dice), None
+
+def replay_sequences(rng, choices, record):
+    dice = roll_dice(6, rng=rng)
+    record.roll(dice)
+    return score_sequences(dice), None
+
+def replay_beat_the_house(rng, choices, record):
+    player_rng, house_rng = rng.spawn('player'), rng.spawn('house')
+    player_wins = house_wins = 0
+    for _ in range(HOUSE_ROUNDS):
+        player_dice = roll_dice(HOUSE_DICE, rng=player_rng)
+        house_dice = roll_dice(HOUSE_DICE, rng=house_rng)
+        record.roll(player_dice)
+        record.roll(house_dice)
+        winner = compare_totals(sum_dice(player_dice), sum_dice(house_dice))
+        player_wins += winner == 1
+        house_wins += winner == 2
+        if house_match_over(player_wins, house_wins):
+            break
+    return player_wins, house_outcome(player_wins, house_wins)
+
+# Inverse of emodice.hold_trace.
+def _hold(choices, n_dice):
+    code = choices.take(0, 32 + sys.maxsize)
+    if code < 32:
+        positions = [i for i in range(5) if code >> i & 1]
+    else:
+        positions = [choices.take(0, 4) for _ in range(code - 32)]
+    if any(i >= n_dice for i in positions):
+        raise TraceError("hold position past the last die")
+    return positions
+
+def replay_yahtzee(rng, choices, record):
+    scorecard = Scorecard()
+    for _ in range(len(YAHTZEE_CATEGORIES)):
+        dice = roll_dice(5, rng=rng)
+        record.roll(dice)
+        for _ in range(2):
+            kept = bytes(dice[i] for i in _hold(choices, len(dice)))
+            if len(kept) >= 5:
+                dice = kept
+                break
+            dice = kept + roll_dice(5 - len(kept), rng=rng)
+            record.roll(dice)
+        cat_id = choices.take(0, len(YAHTZEE_CATEGORIES) - 1)
+        if scorecard[cat_id] is not None:
+            raise TraceError(f"category {YAHTZEE_CATEGORIES[cat_id]} scored twice")
+        scorecard.fill(cat_id, yahtzee_score(dice, YAHTZEE_CATEGORIES[cat_id]))
+    return scorecard.grand_total, None
+
+REPLAYERS = {
+    'simple_roller': replay_simple_roller,
+    'highest_wins': replay_highest_wins,
+    'target_number': replay_target_number,
+    'skull_survival': replay_skull_survival,
+    'doubles': replay_doubles,
+    'sequences': replay_sequences,
+    'beat_the_house': replay_beat_the_house,
+    'yahtzee': replay_yahtzee,
+}
+
+# Plays a trace (a Trace or its encoded bytes) again and returns the
+# (score, outcome) it produces; record.roll sees every roll.
+def replay(trace, record=NO_RECORD):
+    if not isinstance(trace, Trace):
+        trace = Trace.decode(trace)
+    rng = make_dice(trace.backend, trace.seed)
+    rng.prefetch = TRACE_PREFETCH
+    choices = _Choices(trace.choices)
+    result = REPLAYERS[trace.game](rng, choices, record)
+    if not choices.done():
+        raise TraceError("unused choices at the end of the trace")
+    return result
+
+# None if the trace replays to the result it claims, else the reason.
+def check(trace):
+    try:
+        if not isinstance(trace, Trace):
+            trace = Trace.decode(trace)
+        result = replay(trace)
+    except TraceError as e:
+        return f"invalid: {e}"
+    if result != (trace.score, trace.outcome):
+        return f"claimed {trace.score} {trace.outcome}, replays to {result[0]} {result[1]}"
+    return None
+
+# ============================================================
+# BULK VERIFY
+# ============================================================
+def _verify_chunk(job):
+    start, bodies = job
+    failures = []
+    for i, body in enumerate(bodies, start):
+        reason = check(body)
+        if reason is not None:
+            failures.append((i, reason))
+    return failures
+
+# Replays every trace across workers processes (default: all cores) and
+# returns {'traces': n, 'ok': n, 'failed': n, 'failures': [(index, reason)]}.
+def verify(bodies, workers=None, chunk=VERIFY_CHUNK):
+    workers = max(1, workers or os.cpu_count() or 1)
+    jobs = [(start, bodies[start:start + chunk]) for start in range(0, len(bodies), chunk)]
+    if workers == 1 or len(jobs) <= 1:
+        results = list(map(_verify_chunk, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_verify_chunk, jobs))
+    failures = [failure for result in results for failure in result]
+    return {'traces': len(bodies), 'ok': len(bodies) - len(failures),
+            'failed': len(failures), 'failures': failures}
+
+class _RollLog:
+    def __init__(self):
+        self.rolls = []
+
+    def roll(self, dice):
+        self.rolls.append(dice_str(dice))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emodice_replay", description="Replay and verify game traces.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help="replay one trace and list its rolls")
+    show.add_argument('path', nargs='?', default=TRACE_PATH)
+    show.add_argument('--index', type=int, default=-1, help="trace number (default: the last)")
+    check_cmd = commands.add_parser('verify', help="replay every trace and check its result")
+    check_cmd.add_argument('paths', nargs='*', default=[TRACE_PATH])
+    check_cmd.add_argument('--workers', '-w', type=int, default=None,
+                           help="worker processes (default: all cores)")
+    check_cmd.add_argument('--limit', type=int, default=20, help="failures to list (default 20)")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'show':
+            bodies = read_traces(args.path)
+            try:
+                trace = Trace.decode(bodies[args.index])
+            except IndexError:
+                raise SystemExit(f"No trace {args.index}; the file has {len(bodies)}")
+            log = _RollLog()
+            report = trace.summary()
+            try:
+                report['replayed'] = list(replay(trace, log))
+            except TraceError as e:
+                report['error'] = str(e)
+            report['rolls'] = log.rolls
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+            return
+        bodies = [body for path in args.paths for body in read_traces(path)]
+    except (OSError, TraceError) as e:
+        raise SystemExit(str(e))
+    report = verify(bodies, workers=args.workers)
+    report['failures'] = report['failures'][:args.limit]
+    print(json.dumps(report, indent=2))
+    if report['failed']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+emodice_server.py - Asyncio multiplayer server for the emodice games
+https://github.com/D1A881/emodice
+
+Clients connect over TCP and exchange one message per line. Requests are
+either JSON objects ({"cmd": "hold", "keep": [1, 3]}) or plain words
+(hold 1 3), so the server can be driven from netcat as well as programs:
+
+    new yahtzee [seed]        start a session (highest_wins, beat_the_house, yahtzee);
+                              the seed is ignored unless the server runs with --allow-seed
+    roll                      roll (or roll the next player / round)
+    hold 1 3 5                Yahtzee: keep those positions, reroll the rest (all five: stand)
+    score chance              Yahtzee: score the dice in a category
+    state                     show the current session
+    quit                      close the connection
+
+Every reply is a single JSON object line. Each game is a non-blocking state
+machine with its own dice source, and requests from all connections go
+through one bounded queue, so a flood of clients gets backpressure instead
+of unbounded memory use. With --history, finished games are recorded per
+player ({"cmd": "new", "game": "yahtzee", "player": "ann"}); with --trace,
+every finished session is appended as a replay trace for emodice_replay.
+"""
+
+import argparse
+import asyncio
+import json
+
+from emodice import (
+    DICE_BACKENDS, HOUSE_DICE, HOUSE_ROUNDS, MAX_DICE, NO_RECORD, TRACE_PREFETCH,
+    YAHTZEE_CATEGORIES, Scorecard, compare_totals, dice_str, hold_trace, house_match_over,
+    house_outcome, make_dice, roll_dice, sum_dice, yahtzee_score,
+)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+QUEUE_SIZE = 1024
+MAX_LINE = 4096
+
+class GameError(Exception):
+    pass
+
+def _dice(dice):
+    return {'dice': list(dice), 'faces': dice_str(dice)}
+
+# ============================================================
+# GAME STATE MACHINES
+# ============================================================
+# A session owns its dice source and advances only when handle() is called;
+# handle() returns a reply dict and raises GameError for illegal moves.
+# Rolls, choices and the result go to record (see emodice.start_game); dice
+# are drawn in the same order as the emodice_replay replayers, so a session's
+# trace replays to the same game.
+class GameSession:
+    game = None
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.done = False
+        self.record = NO_RECORD
+
+    def roll(self, count, rng=None):
+        dice = roll_dice(count, rng=rng or self.rng)
+        self.record.roll(dice)
+        return dice
+
+    def handle(self, cmd, args):
+        method = getattr(self, 'cmd_' + cmd, None)
+        if method is None:
+            raise GameError(f"unknown command for {self.game}: {cmd}")
+        if self.done and cmd != 'state':
+            raise GameError("game over; start a new one")
+        return method(args)
+
+    def cmd_state(self, args):
+        return dict(self.state(), event='state')
+
+    def state(self):
+        return {'game': self.game, 'seed': self.rng.seed, 'done': self.done}
+
+class HighestWinsSession(GameSession):
+    game = 'highest_wins'
+
+    def __init__(self, rng, count=5):
+        super().__init__(rng)
+        if not 1 <= count <= MAX_DICE // 2:
+            raise GameError(f"count must be between 1 and {MAX_DICE // 2}")
+        self.count = count
+        self.players = [rng.spawn('player1'), rng.spawn('player2')]
+        self.totals = []
+
+    def state(self):
+        return dict(super().state(), count=self.count, totals=self.totals,
+                    turn=len(self.totals) + 1 if not self.done else None)
+
+    def cmd_roll(self, args):
+        player = len(self.totals) + 1
+        if player == 1:
+            self.record.choose(self.count)
+        dice = self.roll(self.count, self.players[player - 1])
+        self.totals.append(sum_dice(dice))
+        reply = dict(_dice(dice), event='roll', player=player, total=self.totals[-1])
+        if player == 2:
+            self.done = True
+            reply['winner'] = compare_totals(*self.totals)
+            self.record.finish(self.totals[0], ['draw', 'win', 'loss'][reply['winner']])
+        return reply
+
+class BeatTheHouseSession(GameSession):
+    game = 'beat_the_house'
+
+    def __init__(self, rng):
+        super().__init__(rng)
+        self.player_rng, self.house_rng = rng.spawn('player'), rng.spawn('house')
+        self.round = 0
+        self.player_wins = 0
+        self.house_wins = 0
+
+    def state(self):
+        return dict(super().state(), round=self.round,
+                    player_wins=self.player_wins, house_wins=self.house_wins)
+
+    def cmd_roll(self, args):
+        self.round += 1
+        player = self.roll(HOUSE_DICE, self.player_rng)
+        house = self.roll(HOUSE_DICE, self.house_rng)
+        winner = compare_totals(sum_dice(player), sum_dice(house))
+        if winner == 1:
+            self.player_wins += 1
+        elif winner == 2:
+            self.house_wins += 1
+        reply = {
+            'event': 'round', 'round': self.round, 'winner': ['tie', 'player', 'house'][winner],
+            'player': dict(_dice(player), total=sum_dice(player)),
+            'house': dict(_dice(house), total=sum_dice(house)),
+        }
+        if house_match_over(self.player_wins, self.house_wins) or self.round == HOUSE_ROUNDS:
+            self.done = True
+            outcome = house_outcome(self.player_wins, self.house_wins)
+            reply['match'] = {'win': 'player', 'loss': 'house', 'draw': 'draw'}[outcome]
+            self.record.finish(self.player_wins, outcome)
+        return dict(reply, **self.state())
+
+class YahtzeeSession(GameSession):
+    game = 'yahtzee'
+
+    def __init__(self, rng):
+        super().__init__(rng)
+        self.scorecard = Scorecard()
+        self.round = 1
+        self.rolls = 0
+        self.dice = b""
+
+    def state(self):
+        return dict(super().state(), round=self.round, rolls=self.rolls,
+                    scorecard=self.scorecard.as_dict(), total=self.scorecard.grand_total,
+                    **_dice(self.dice))
+
+    def cmd_roll(self, args):
+        if self.rolls:
+            raise GameError("already rolled; hold dice or score")
+        self.dice = self.roll(5)
+        self.rolls = 1
+        return dict(_dice(self.dice), event='roll', rolls=self.rolls)
+
+    def cmd_hold(self, args):
+        if not self.rolls:
+            raise GameError("roll first")
+        if self.rolls >= 3:
+            raise GameError("no rerolls left; score a category")
+        try:
+            keep = sorted({int(i) - 1 for i in args})
+        except (TypeError, ValueError):
+            raise GameError("hold takes dice positions 1-5") from None
+        if any(not 0 <= i < 5 for i in keep):
+            raise GameError("hold takes dice positions 1-5")
+        self.record.choose(*hold_trace(keep))
+        if len(keep) == 5:
+            self.rolls = 3
+            return dict(_dice(self.dice), event='roll', rolls=self.rolls)
+        kept = bytes(self.dice[i] for i in keep)
+        self.dice = kept + roll_dice(5 - len(kept), rng=self.rng)
+        self.record.roll(self.dice)
+        self.rolls += 1
+        return dict(_dice(self.dice), event='roll', rolls=self.rolls)
+
+    def cmd_score(self, args):
+        if not self.rolls:
+            raise GameError("roll first")
+        category = args[0] if args else None
+        if category not in YAHTZEE_CATEGORIES:
+            raise GameError(f"category must be one of: {', '.join(YAHTZEE_CATEGORIES)}")
+        if not self.scorecard.is_open(category):
+            raise GameError(f"{category} already scored")
+        if self.rolls < 3:
+            self.record.choose(*hold_trace(range(5)))
+        self.record.choose(YAHTZEE_CATEGORIES.index(category))
+        points = yahtzee_score(self.dice, category)
+        self.scorecard.fill(category, points)
+        self.rolls = 0
+        self.dice = b""
+        if self.scorecard.complete:
+            self.done = True
+            self.record.finish(self.scorecard.grand_total)
+        else:
+            self.round += 1
+        return dict(self.state(), event='scored', category=category, points=points)
+
+SESSIONS = {
+    'highest_wins': HighestWinsSession,
+    'beat_the_house': BeatTheHouseSession,
+    'yahtzee': YahtzeeSession,
+}
+
+# ============================================================
+# PROTOCOL
+# ============================================================
+# Returns (cmd, args) from a JSON or plain-text request line.
+def parse_request(line):
+    line = line.strip()
+    if line.startswith('{'):
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            raise GameError("malformed JSON") from None
+        cmd = str(msg.get('cmd', ''))
+        if cmd == 'new':
+            args = [msg.get('game'), msg.get('seed'), msg.get('count'), msg.get('player')]
+        elif cmd == 'hold':
+            args = list(msg.get('keep', []))
+        elif cmd == 'score':
+            args = [msg.get('category')]
+        else:
+            args = []
+        return cmd.lower(), args
+    words = line.split()
+    if not words:
+        raise GameError("empty request")
+    return words[0].lower(), words[1:]
+
+# ============================================================
+# SERVER
+# ============================================================
+class Connection:
+    def __init__(self):
+        self.session = None
+
+class DiceServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, seed=None, backend='mt',
+                 queue_size=QUEUE_SIZE, workers=1, history=None, traces=None, allow_seed=False):
+        self.host = host
+        self.port = port
+        self.master = make_dice(backend, seed)
+        self.queue_size = queue_size
+        self.queue = None
+        self.workers = workers
+        self.history = history
+        self.traces = traces
+        self.allow_seed = allow_seed
+        self.connections = 0
+        self.sessions_started = 0
+        self._server = None
+        self._tasks = []
+
+    # A client's seed is honoured only with allow_seed: anyone holding the
+    # seed can replay it locally and see every roll before it happens, so
+    # seeded sessions are never recorded to the history either.
+    def new_session(self, args):
+        game = args[0] if args else None
+        if game not in SESSIONS:
+            raise GameError(f"game must be one of: {', '.join(SESSIONS)}")
+        seed = args[1] if self.allow_seed and len(args) > 1 and args[1] is not None else None
+        rng = make_dice(self.master.name, int(seed)) if seed is not None else self.master.spawn('session')
+        traced = self.traces is not None and rng.name != 'secure'
+        if traced:
+            rng.prefetch = TRACE_PREFETCH
+        if game == 'highest_wins' and len(args) > 2 and args[2] is not None:
+            session = HighestWinsSession(rng, int(args[2]))
+        else:
+            session = SESSIONS[game](rng)
+        if self.history is not None and seed is None:
+            player = str(args[3]) if len(args) > 3 and args[3] else 'anonymous'
+            session.record = self.history.game(game, player[:64], rng.seed)
+        if traced:
+            session.record = self.traces.game(game, rng, session.record)
+        self.sessions_started += 1
+        return session
+
+    def dispatch(self, conn, line):
+        try:
+            cmd, args = parse_request(line)
+            if cmd == 'new':
+                conn.session = self.new_session(args)
+                return dict(conn.session.state(), event='new')
+            if cmd == 'quit':
+                return {'event': 'bye'}
+            if conn.session is None:
+                raise GameError("no game; send: new <game>")
+            return conn.session.handle(cmd, args)
+        except GameError as e:
+            return {'event': 'error', 'error': str(e)}
+        except (TypeError, ValueError) as e:
+            return {'event': 'error', 'error': f"bad request: {e}"}
+
+    # Requests are processed in arrival order by the queue workers; each
+    # carries the future its connection is waiting on.
+    async def _worker(self):
+        while True:
+            conn, line, future = await self.queue.get()
+            if not future.cancelled():
+                future.set_result(self.dispatch(conn, line))
+            self.queue.task_done()
+
+    async def _client(self, reader, writer):
+        self.connections += 1
+        conn = Connection()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if len(line) > MAX_LINE:
+                    reply = {'event': 'error', 'error': "request too long"}
+                elif not line.strip():
+                    continue
+                else:
+                    future = loop.create_future()
+                    await self.queue.put((conn, line.decode('utf-8', 'replace'), future))
+                    reply = await future
+                writer.write(json.dumps(reply, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+                if reply.get('event') == 'bye':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._client, self.host, self.port, limit=MAX_LINE * 2)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        if self.history is not None:
+            self.history.flush()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emodice_server", description="Serve emodice games over TCP.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--seed', type=int, default=None, help="master seed for session dice")
+    parser.add_argument('--rng', choices=list(DICE_BACKENDS), default='mt', help="dice backend (default mt)")
+    parser.add_argument('--allow-seed', action='store_true',
+                        help="let clients pick a session seed (for testing; such games skip --history)")
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--history', metavar='PATH', help="record finished games to this history database")
+    parser.add_argument('--trace', nargs='?', const='', default=None, metavar='PATH',
+                        help="append a replay trace of every finished session (default ~/.cache/emodice)")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="serve per-game call counts and timings at http://HOST:PORT/metrics")
+    args = parser.parse_args(argv)
+    if args.trace is not None and args.rng == 'secure':
+        parser.error("--trace needs a seeded --rng; secure sessions cannot be replayed")
+    if args.metrics_port is not None:
+        import emodice_metrics
+        emodice_metrics.enable().serve(args.host, args.metrics_port)
+    history = None
+    if args.history:
+        from emodice_history import HistoryStore
+        history = HistoryStore(args.history)
+    traces = None
+    if args.trace is not None:
+        from emodice_replay import TRACE_PATH, TraceLog
+        traces = TraceLog(args.trace or TRACE_PATH)
+    server = DiceServer(args.host, args.port, args.seed, args.rng, args.queue_size,
+                        history=history, traces=traces, allow_seed=args.allow_seed)
+    print(f"emodice server on {args.host}:{args.port} (seed {server.master.seed})")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if history is not None:
+            history.close()
+        if traces is not None:
+            traces.close()
+
+if __name__ == "__main__":
+    main()
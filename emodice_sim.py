@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+emodice_sim.py - Headless Monte Carlo simulation of the emodice games
+https://github.com/D1A881/emodice
+"""
+
+import math
+import os
+import random
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from emodice import (
+    HOUSE_DICE, HOUSE_ROUNDS, HOUSE_WINS_NEEDED, MAX_DICE, SKULL, SKULL_LIMIT,
+    SKULL_SURVIVAL_DICE, TARGET_ATTEMPTS, YAHTZEE_CATEGORIES, compare_totals,
+    count_values, derive_seed, dice_source, house_match_over, make_dice, roll_many,
+    score_doubles, score_sequences,
+    DiceSource, Scorecard, yahtzee_score, yahtzee_scores,
+)
+
+# Games are simulated in blocks of this many so memory stays bounded no
+# matter how many games are requested.
+BLOCK_GAMES = 65536
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+# ============================================================
+# RESULTS
+# ============================================================
+# Aggregate outcome of a batch of simulated games: a histogram of the
+# per-game value (score, margin, attempts...) plus a count of each outcome
+# label (win/loss/bust...). Statistics are computed from the histogram, so
+# results from separate runs can be merged exactly.
+class SimResult:
+    def __init__(self, game):
+        self.game = game
+        self.seed = None
+        self.games = 0
+        self.histogram = Counter()
+        self.outcomes = Counter()
+
+    def add(self, value, outcome=None, n=1):
+        self.games += n
+        self.histogram[value] += n
+        if outcome is not None:
+            self.outcomes[outcome] += n
+
+    def merge(self, other):
+        self.games += other.games
+        self.histogram.update(other.histogram)
+        self.outcomes.update(other.outcomes)
+        return self
+
+    def mean(self):
+        if not self.games:
+            return 0.0
+        return sum(v * n for v, n in self.histogram.items()) / self.games
+
+    def variance(self):
+        if not self.games:
+            return 0.0
+        mean = self.mean()
+        return sum(n * (v - mean) ** 2 for v, n in self.histogram.items()) / self.games
+
+    # Nearest-rank percentile, p in 0-100.
+    def percentile(self, p):
+        if not self.games:
+            return None
+        rank = max(1, math.ceil(p / 100 * self.games))
+        seen = 0
+        for value in sorted(self.histogram):
+            seen += self.histogram[value]
+            if seen >= rank:
+                return value
+        return value
+
+    def rates(self):
+        if not self.games:
+            return {}
+        return {k: n / self.games for k, n in sorted(self.outcomes.items())}
+
+    def summary(self):
+        return {
+            'game': self.game,
+            'seed': self.seed,
+            'games': self.games,
+            'mean': self.mean(),
+            'variance': self.variance(),
+            'stdev': math.sqrt(self.variance()),
+            'min': min(self.histogram) if self.histogram else None,
+            'max': max(self.histogram) if self.histogram else None,
+            'percentiles': {p: self.percentile(p) for p in PERCENTILES},
+            'outcomes': self.rates(),
+        }
+
+# ============================================================
+# DICE SOURCES
+# ============================================================
+# Hands out dice one request at a time, for games whose dice usage depends
+# on the player's decisions. The dice source's prefetch buffer does the
+# batching.
+class DiceStream:
+    def __init__(self, rng, include_skull=False):
+        self.source = dice_source(rng)
+        self.include_skull = include_skull
+
+    def take(self, n):
+        return self.source.faces(n, self.include_skull)
+
+def _blocks(n_games):
+    while n_games > 0:
+        size = min(n_games, BLOCK_GAMES)
+        yield size
+        n_games -= size
+
+def _split(block, size):
+    return [block[i:i + size] for i in range(0, len(block), size)]
+
+# Score lookups memoized by the roll itself; there are at most 7**6 distinct
+# rolls for any game here, so these stay small.
+_DOUBLES = {}
+_SEQUENCES = {}
+
+def _memo(cache, rule, roll):
+    score = cache.get(roll)
+    if score is None:
+        score = cache[roll] = rule(roll)
+    return score
+
+# ============================================================
+# POLICIES
+# ============================================================
+# Skull Survival policies are called as policy(score, skulls) before each
+# roll and return True to roll again. Policies are plain classes rather than
+# closures so they can be pickled out to worker processes.
+class SkullThreshold:
+    def __init__(self, stop_score):
+        self.stop_score = stop_score
+
+    def __call__(self, score, skulls):
+        return score < self.stop_score
+
+# Yahtzee policies provide hold(dice, rolls_left, scorecard), returning the
+# dice to keep, and choose(dice, scorecard), returning an open category.
+class GreedyYahtzeePolicy:
+    def hold(self, dice, rolls_left, scorecard):
+        counts = count_values(dice)
+        face = max(counts, key=lambda v: (counts[v], v))
+        return bytes([face]) * counts[face]
+
+    def choose(self, dice, scorecard):
+        scores = yahtzee_scores(dice)
+        return YAHTZEE_CATEGORIES[max(scorecard.open_ids(), key=scores.__getitem__)]
+
+# Plays for the upper-section bonus: holds the most common face whose upper
+# box is still open and books three or more of a face there. Made hands
+# (Yahtzee, large straight, full house) are kept and taken when they come.
+class UpperBonusYahtzeePolicy:
+    MADE_HANDS = [YAHTZEE_CATEGORIES.index(c) for c in ('yahtzee', 'large_straight', 'full_house')]
+    CHANCE = YAHTZEE_CATEGORIES.index('chance')
+
+    def _made_hand(self, scores, open_ids):
+        for cat_id in self.MADE_HANDS:
+            if scores[cat_id] and cat_id in open_ids:
+                return cat_id
+        return None
+
+    def hold(self, dice, rolls_left, scorecard):
+        open_ids = scorecard.open_ids()
+        if self._made_hand(yahtzee_scores(dice), open_ids) is not None:
+            return dice
+        counts = count_values(dice)
+        faces = [v for v in counts if v - 1 in open_ids] or list(counts)
+        face = max(faces, key=lambda v: (counts[v], v))
+        return bytes([face]) * counts[face]
+
+    def choose(self, dice, scorecard):
+        scores = yahtzee_scores(dice)
+        open_ids = scorecard.open_ids()
+        made = self._made_hand(scores, open_ids)
+        if made is not None:
+            return YAHTZEE_CATEGORIES[made]
+        counts = count_values(dice)
+        upper = [v - 1 for v, n in counts.items() if n >= 3 and v - 1 in open_ids]
+        if upper:
+            return YAHTZEE_CATEGORIES[max(upper)]
+        lower = [i for i in open_ids if i >= 6 and i != self.CHANCE and scores[i]]
+        if lower:
+            return YAHTZEE_CATEGORIES[max(lower, key=scores.__getitem__)]
+        if self.CHANCE in open_ids:
+            return YAHTZEE_CATEGORIES[self.CHANCE]
+        # Nothing fits: book the upper box furthest below par (three of the
+        # face) the least, or else scratch the least valuable box.
+        upper = [i for i in open_ids if i < 6]
+        if upper:
+            return YAHTZEE_CATEGORIES[min(upper, key=lambda i: 3 * (i + 1) - scores[i])]
+        return YAHTZEE_CATEGORIES[max(open_ids, key=scores.__getitem__)]
+
+# Policies can be user code, so their moves are checked: held dice must come
+# from the current roll and the category must be one still open. Both raise
+# ValueError naming the policy otherwise.
+def checked_hold(policy, dice, kept):
+    kept = bytes(kept)
+    if len(kept) > len(dice) or any(kept.count(v) > dice.count(v) for v in set(kept)):
+        raise ValueError(f"{type(policy).__name__} held {list(kept)}, not part of the roll {list(dice)}")
+    return kept
+
+def checked_category(policy, scorecard, cat):
+    if cat not in YAHTZEE_CATEGORIES or not scorecard.is_open(cat):
+        raise ValueError(f"{type(policy).__name__} chose {cat!r}, which is not an open category")
+    return cat
+
+# ============================================================
+# GAME SIMULATORS
+# ============================================================
+# Totals of n rolls of count dice. Above MAX_DICE each roll is drawn as face
+# counts, so a game costs the same however many dice it has.
+def _pool_totals(n, count, include_skull, rng):
+    source = dice_source(rng)
+    for _ in range(n):
+        yield sum(code * k for code, k in enumerate(source.pool(count, include_skull)))
+
+def sim_simple_roller(result, n_games, rng, policy=None, count=2, include_skull=False):
+    if count > MAX_DICE:
+        for total, n in Counter(_pool_totals(n_games, count, include_skull, rng)).items():
+            result.add(total, n=n)
+        return
+    for size in _blocks(n_games):
+        block = roll_many(size, count, include_skull, rng)
+        for total, n in Counter(map(sum, _split(block, count))).items():
+            result.add(total, n=n)
+
+def sim_highest_wins(result, n_games, rng, policy=None, count=2):
+    labels = {0: 'tie', 1: 'player1', 2: 'player2'}
+    for size in _blocks(n_games):
+        totals = list(map(sum, _split(roll_many(2 * size, count, False, rng), count)))
+        games = Counter(zip(totals[0::2], totals[1::2]))
+        for (p1, p2), n in games.items():
+            result.add(p1 - p2, labels[compare_totals(p1, p2)], n)
+
+def sim_target_number(result, n_games, rng, policy=None, count=3, target=None,
+                      attempts=TARGET_ATTEMPTS):
+    if target is None:
+        target = (7 * count) // 2
+    for size in _blocks(n_games):
+        if count > MAX_DICE:
+            totals = list(_pool_totals(size * attempts, count, False, rng))
+        else:
+            totals = list(map(sum, _split(roll_many(size * attempts, count, False, rng), count)))
+        for start in range(0, len(totals), attempts):
+            try:
+                taken = totals.index(target, start, start + attempts) - start + 1
+                result.add(taken, 'hit')
+            except ValueError:
+                result.add(attempts, 'miss')
+
+def sim_skull_survival(result, n_games, rng, policy=None):
+    policy = policy or SkullThreshold(25)
+    stream = DiceStream(rng, include_skull=True)
+    rounds = {}
+    for _ in range(n_games):
+        score = skulls = 0
+        outcome = 'stop'
+        while policy(score, skulls):
+            dice = stream.take(SKULL_SURVIVAL_DICE)
+            step = rounds.get(dice)
+            if step is None:
+                step = rounds[dice] = (sum(dice), dice.count(SKULL))
+            score += step[0]
+            skulls += step[1]
+            if skulls >= SKULL_LIMIT:
+                outcome = 'bust'
+                break
+        result.add(score, outcome)
+
+def sim_doubles(result, n_games, rng, policy=None):
+    for size in _blocks(n_games):
+        for roll, n in Counter(_split(roll_many(size, 6, False, rng), 6)).items():
+            result.add(_memo(_DOUBLES, score_doubles, roll), n=n)
+
+def sim_sequences(result, n_games, rng, policy=None):
+    for size in _blocks(n_games):
+        for roll, n in Counter(_split(roll_many(size, 6, False, rng), 6)).items():
+            result.add(_memo(_SEQUENCES, score_sequences, roll), n=n)
+
+def sim_beat_the_house(result, n_games, rng, policy=None):
+    rolls_per_game = 2 * HOUSE_ROUNDS
+    for size in _blocks(n_games):
+        block = roll_many(size * rolls_per_game, HOUSE_DICE, False, rng)
+        totals = list(map(sum, _split(block, HOUSE_DICE)))
+        for start in range(0, len(totals), rolls_per_game):
+            player_wins = house_wins = 0
+            for i in range(start, start + rolls_per_game, 2):
+                winner = compare_totals(totals[i], totals[i + 1])
+                if winner == 1:
+                    player_wins += 1
+                elif winner == 2:
+                    house_wins += 1
+                if house_match_over(player_wins, house_wins):
+                    break
+            if player_wins == HOUSE_WINS_NEEDED:
+                outcome = 'player'
+            elif house_wins == HOUSE_WINS_NEEDED:
+                outcome = 'house'
+            else:
+                outcome = 'draw'
+            result.add(player_wins - house_wins, outcome)
+
+def play_yahtzee(policy, stream):
+    scorecard = Scorecard()
+    for _ in range(len(YAHTZEE_CATEGORIES)):
+        dice = stream.take(5)
+        for rolls_left in (2, 1):
+            kept = checked_hold(policy, dice, policy.hold(dice, rolls_left, scorecard))
+            if len(kept) >= 5:
+                break
+            dice = kept + stream.take(5 - len(kept))
+        cat = checked_category(policy, scorecard, policy.choose(dice, scorecard))
+        scorecard.fill(cat, yahtzee_score(dice, cat))
+    return scorecard
+
+def sim_yahtzee(result, n_games, rng, policy=None):
+    policy = policy or GreedyYahtzeePolicy()
+    stream = DiceStream(rng)
+    for _ in range(n_games):
+        scorecard = play_yahtzee(policy, stream)
+        result.add(scorecard.grand_total, 'bonus' if scorecard.upper_bonus else 'no_bonus')
+
+SIMULATORS = {
+    'simple_roller': sim_simple_roller,
+    'highest_wins': sim_highest_wins,
+    'target_number': sim_target_number,
+    'skull_survival': sim_skull_survival,
+    'doubles': sim_doubles,
+    'sequences': sim_sequences,
+    'beat_the_house': sim_beat_the_house,
+    'yahtzee': sim_yahtzee,
+}
+
+# Runs n_games headless games and returns a SimResult. Dice come from rng if
+# given, else from a new `backend` source seeded with seed. Extra keyword
+# options are passed to the game's simulator (e.g. count=, target= for
+# Target Number).
+def simulate(game, n_games, seed=None, policy=None, rng=None, backend='mt', **options):
+    if game not in SIMULATORS:
+        raise ValueError(f"Unknown game: {game!r}")
+    rng = rng or make_dice(backend, seed)
+    result = SimResult(game)
+    # A bare random.Random has a seed() method but no seed to report.
+    result.seed = rng.seed if isinstance(rng, DiceSource) else seed
+    SIMULATORS[game](result, n_games, rng, policy, **options)
+    return result
+
+# ============================================================
+# PARALLEL RUNNER
+# ============================================================
+# Each shard gets its own dice stream from the chosen backend, seeded with
+# derive_seed(seed, 'shard', index), so shards are independent streams and a
+# run is fully determined by (seed, workers, backend).
+def shard_seeds(seed, shards):
+    return [derive_seed(seed, 'shard', i) for i in range(shards)]
+
+def shard_sizes(n_games, shards):
+    base, extra = divmod(n_games, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+# With collect, the shard runs under emodice_metrics and its counters come
+# back with the result.
+def _run_shard(job):
+    game, n_games, shard_seed, policy, backend, options, collect = job
+    if collect:
+        import emodice_metrics
+        return emodice_metrics.collect(simulate, game, n_games, seed=shard_seed, policy=policy,
+                                       backend=backend, **options)
+    return simulate(game, n_games, seed=shard_seed, policy=policy, backend=backend, **options), None
+
+# The emodice_metrics counters in use in this process, if metrics are on.
+def _active_metrics():
+    module = sys.modules.get('emodice_metrics')
+    return module.active() if module is not None else None
+
+# Shards n_games across a process pool (one shard per worker, default: all
+# cores) and merges the shard histograms in shard order. With no seed a
+# random master seed is drawn and recorded on the result for replay. When
+# emodice_metrics is enabled, each worker's counters are merged into it.
+def simulate_parallel(game, n_games, seed=None, workers=None, policy=None, backend='mt', **options):
+    if game not in SIMULATORS:
+        raise ValueError(f"Unknown game: {game!r}")
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    workers = max(1, workers or os.cpu_count() or 1)
+    metrics = _active_metrics() if workers > 1 else None
+    jobs = [(game, size, shard_seed, policy, backend, options, metrics is not None)
+            for size, shard_seed in zip(shard_sizes(n_games, workers), shard_seeds(seed, workers))]
+    if workers == 1:
+        shards = [_run_shard(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_run_shard, jobs))
+    result = SimResult(game)
+    result.seed = seed
+    for shard, counts in shards:
+        result.merge(shard)
+        if counts is not None:
+            metrics.merge(counts)
+    return result
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+emodice_skulls.py - Exact stop/roll strategy for Skull Survival
+https://github.com/D1A881/emodice
+
+A Skull Survival game between rolls is fully described by (score, skulls so
+far). Every roll that does not bust adds at least 3 points, so the states
+form a chain in increasing score and one backward sweep of value iteration
+from the score cap down gives exact values: the expected final score under
+optimal play and the stop/roll decision for every state. Any other policy
+is evaluated the same way, exactly and without sampling.
+
+What a bust pays is a parameter (BUST_RULES). Under emodice.py's rules the
+busting roll still scores ('keep'), so rolling can never lower the final
+score and the optimal policy is to roll until bust; 'lose' and 'banked'
+model the usual push-your-luck payouts.
+
+    python3 emodice_skulls.py [--bust lose] [--thresholds 10 200 10]
+"""
+
+import argparse
+import json
+from collections import Counter
+from itertools import combinations_with_replacement
+
+from emodice import SKULL, SKULL_LIMIT, SKULL_SURVIVAL_DICE
+from emodice_odds import outcome_count
+
+# Scores at or above the cap are a forced stop. Under always-roll the chance
+# of getting that far is below 1e-12, so the truncation does not show up in
+# any value.
+SCORE_CAP = 1500
+# Solving is linear in the cap; this keeps a CLI run to a few seconds.
+MAX_SCORE_CAP = 100000
+
+# Final score when a roll busts, from the score before it and its points.
+BUST_RULES = {
+    'keep': lambda score, points: score + points,
+    'banked': lambda score, points: score,
+    'lose': lambda score, points: 0,
+}
+
+# (points, skulls, probability) for every distinct outcome of one roll.
+def roll_outcomes(n_dice=SKULL_SURVIVAL_DICE):
+    counts = Counter()
+    for sig in combinations_with_replacement(range(7), n_dice):
+        counts[sum(sig), sig.count(SKULL)] += outcome_count(sig)
+    total = 7 ** n_dice
+    return [(points, skulls, n / total) for (points, skulls), n in sorted(counts.items())]
+
+OUTCOMES = roll_outcomes()
+
+# Values every state from the cap down. decide(score, skulls, roll_value)
+# returns True to roll; the result is (values, bust chances, roll flags),
+# each indexed [skulls][score].
+def _sweep(decide, bust, cap):
+    try:
+        payout = BUST_RULES[bust]
+    except KeyError:
+        raise ValueError(f"Unknown bust rule: {bust!r}") from None
+    values = [[0.0] * cap for _ in range(SKULL_LIMIT)]
+    busts = [[0.0] * cap for _ in range(SKULL_LIMIT)]
+    rolls = [bytearray(cap) for _ in range(SKULL_LIMIT)]
+    for score in range(cap - 1, -1, -1):
+        for skulls in range(SKULL_LIMIT):
+            roll_value = bust_chance = 0.0
+            for points, new, p in OUTCOMES:
+                total = skulls + new
+                if total >= SKULL_LIMIT:
+                    roll_value += p * payout(score, points)
+                    bust_chance += p
+                elif score + points < cap:
+                    roll_value += p * values[total][score + points]
+                    bust_chance += p * busts[total][score + points]
+                else:
+                    roll_value += p * (score + points)
+            if decide(score, skulls, roll_value):
+                rolls[skulls][score] = 1
+                values[skulls][score] = roll_value
+                busts[skulls][score] = bust_chance
+            else:
+                values[skulls][score] = score
+    return values, busts, rolls
+
+class SkullSurvivalSolution:
+    def __init__(self, bust, cap, values, busts, rolls):
+        self.bust = bust
+        self.cap = cap
+        self.values = values
+        self.busts = busts
+        self.rolls = rolls
+
+    # O(1) policy lookup; also callable as policy(score, skulls) anywhere
+    # emodice_sim takes a Skull Survival policy.
+    def should_roll(self, score, skulls):
+        return self.rolls[skulls][min(score, self.cap - 1)] == 1
+
+    __call__ = should_roll
+
+    # Expected final score from a state when playing this policy.
+    def value(self, score=0, skulls=0):
+        if score >= self.cap:
+            return float(score)
+        return self.values[skulls][score]
+
+    @property
+    def expected_score(self):
+        return self.values[0][0]
+
+    @property
+    def bust_rate(self):
+        return self.busts[0][0]
+
+    # For each skull count, the lowest score at which the policy stops, or
+    # None if it rolls at every score below the cap.
+    def thresholds(self):
+        result = {}
+        for skulls, row in enumerate(self.rolls):
+            stop = row.find(0)
+            result[skulls] = None if stop < 0 else stop
+        return result
+
+    def summary(self):
+        return {'bust_rule': self.bust, 'expected_score': self.expected_score,
+                'bust_rate': self.bust_rate, 'stop_at': self.thresholds()}
+
+_SOLUTIONS = {}
+
+# Optimal policy for a bust rule, computed once per (bust, cap).
+def solve(bust='keep', cap=SCORE_CAP):
+    key = (bust, cap)
+    solution = _SOLUTIONS.get(key)
+    if solution is None:
+        solution = _SOLUTIONS[key] = SkullSurvivalSolution(
+            bust, cap, *_sweep(lambda score, skulls, roll_value: roll_value > score, bust, cap))
+    return solution
+
+# Exact expected score and bust rate of any policy(score, skulls).
+def evaluate(policy, bust='keep', cap=SCORE_CAP):
+    return SkullSurvivalSolution(
+        bust, cap, *_sweep(lambda score, skulls, roll_value: policy(score, skulls), bust, cap))
+
+def evaluate_many(policies, bust='keep', cap=SCORE_CAP):
+    return [evaluate(policy, bust, cap) for policy in policies]
+
+# Expected score of SkullThreshold(t) for every t in stop_scores.
+def threshold_curve(stop_scores, bust='keep', cap=SCORE_CAP):
+    from emodice_sim import SkullThreshold
+    return {t: evaluate(SkullThreshold(t), bust, cap).expected_score for t in stop_scores}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emodice_skulls", description="Optimal Skull Survival strategy.")
+    parser.add_argument('--bust', choices=list(BUST_RULES), default='keep',
+                        help="what a bust pays (default keep, as in the game)")
+    parser.add_argument('--cap', type=int, default=SCORE_CAP, help=f"score cap (default {SCORE_CAP})")
+    parser.add_argument('--thresholds', type=int, nargs=3, metavar=('START', 'STOP', 'STEP'),
+                        help="also evaluate stop-at-score thresholds in range(START, STOP, STEP)")
+    args = parser.parse_args(argv)
+    if not 1 <= args.cap <= MAX_SCORE_CAP:
+        parser.error(f"--cap must be between 1 and {MAX_SCORE_CAP}")
+    if args.thresholds and args.thresholds[2] == 0:
+        parser.error("--thresholds STEP must not be zero")
+    report = solve(args.bust, args.cap).summary()
+    if args.thresholds:
+        report['threshold_scores'] = threshold_curve(range(*args.thresholds), args.bust, args.cap)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+emodice_solver.py - Optimal solo Yahtzee strategy for emodice
+https://github.com/D1A881/emodice
+
+Between turns a game is fully described by the set of open categories (a
+13-bit mask, bit i = YAHTZEE_CATEGORIES[i] still open) and the upper-section
+subtotal capped at 63. The value table holds the expected final score still
+to come from every such state under optimal play. It is computed once by
+dynamic programming (python3 emodice_solver.py), saved as a flat binary
+array and memory-mapped on load; hold and category decisions are then
+derived from it turn by turn.
+"""
+
+import array
+import mmap
+import os
+import sys
+from itertools import combinations
+from operator import mul
+
+from emodice import (
+    UPPER_BONUS, UPPER_BONUS_THRESHOLD, YAHTZEE_CATEGORIES, YAHTZEE_UPPER,
+    count_values, yahtzee_score,
+)
+from emodice_batch import score_columns
+from emodice_odds import CACHE_DIR, outcome_count, signature, signatures
+
+N_CATEGORIES = len(YAHTZEE_CATEGORIES)
+FULL_MASK = (1 << N_CATEGORIES) - 1
+UPPER_CAP = UPPER_BONUS_THRESHOLD
+UPPER_STATES = UPPER_CAP + 1
+TABLE_SIZE = (FULL_MASK + 1) * UPPER_STATES
+VALUES_PATH = os.path.join(CACHE_DIR, 'yahtzee_values.bin')
+# 8-byte header: format tag and version, the byte order the floats were
+# written in, and a zero pad byte.
+MAGIC_TAG = b'EMDYZ1'
+MAGIC = MAGIC_TAG + (b'<' if sys.byteorder == 'little' else b'>') + b'\0'
+SWAPPED_MAGIC = MAGIC_TAG + (b'>' if sys.byteorder == 'little' else b'<') + b'\0'
+TURN_CACHE_SIZE = 4096
+
+# ============================================================
+# TRANSITION TABLES
+# ============================================================
+# ROLLS are the 252 sorted 5-dice rolls and KEEPS the 462 sorted holds of
+# 0-5 dice, ordered by size so the 5-dice holds come last in ROLLS order.
+# KEEP_CHILDREN[k] are the six holds one more die turns hold k into, and
+# ROLL_KEEPS[r] lists the distinct holds available from a roll.
+ROLLS = signatures(5)
+ROLL_INDEX = {r: i for i, r in enumerate(ROLLS)}
+ROLL_PROB = [outcome_count(r) / 6 ** 5 for r in ROLLS]
+KEEPS = [k for n in range(6) for k in signatures(n)]
+KEEP_INDEX = {k: i for i, k in enumerate(KEEPS)}
+PARTIAL_KEEPS = len(KEEPS) - len(ROLLS)
+KEEP_CHILDREN = [
+    [KEEP_INDEX[signature(k + bytes([face]))] for face in range(1, 7)]
+    for k in KEEPS[:PARTIAL_KEEPS]
+]
+ROLL_KEEPS = [
+    sorted({KEEP_INDEX[bytes(sub)] for n in range(6) for sub in combinations(r, n)})
+    for r in ROLLS
+]
+SCORES = score_columns(ROLLS)
+FACE_COUNTS = [[r.count(face) for r in ROLLS] for face in range(1, 7)]
+
+def _popcount(n):
+    return bin(n).count('1')
+
+# Capped upper subtotals reachable once a given set of upper categories
+# (6-bit mask) has been filled; other subtotals never occur.
+def _reachable_upper():
+    reach = []
+    for filled in range(1 << len(YAHTZEE_UPPER)):
+        sums = {0}
+        for c in range(len(YAHTZEE_UPPER)):
+            if filled >> c & 1:
+                sums = {min(UPPER_CAP, s + k * (c + 1)) for s in sums for k in range(6)}
+        reach.append(sorted(sums))
+    return reach
+
+# ============================================================
+# TURN EVALUATION
+# ============================================================
+# Value of scoring each final roll in category c from state (mask, up),
+# including any upper bonus earned and the value of the state that follows.
+def _category_values(values, mask, up, c):
+    rest = (mask & ~(1 << c)) * UPPER_STATES
+    if c < len(YAHTZEE_UPPER):
+        by_count = []
+        for k in range(6):
+            score = k * (c + 1)
+            new_up = min(UPPER_CAP, up + score)
+            bonus = UPPER_BONUS if up < UPPER_CAP <= new_up else 0
+            by_count.append(score + bonus + values[rest + new_up])
+        return [by_count[k] for k in FACE_COUNTS[c]]
+    future = values[rest + up]
+    return [score + future for score in SCORES[c]]
+
+# A hold is worth the average over the next die's face of the hold one die
+# larger, so holds are valued from five dice down to none.
+def _keep_values(roll_values):
+    keep_values = [0.0] * PARTIAL_KEEPS + list(roll_values)
+    get = keep_values.__getitem__
+    for k in range(PARTIAL_KEEPS - 1, -1, -1):
+        keep_values[k] = sum(map(get, KEEP_CHILDREN[k])) / 6
+    return keep_values
+
+def _best_keeps(keep_values):
+    get = keep_values.__getitem__
+    return [max(map(get, keeps)) for keeps in ROLL_KEEPS]
+
+# Expected values for one turn from state (mask, up): keep_values[0] and [1]
+# are the value of each hold with one and two rerolls to come; first is the
+# value of each opening roll.
+def _turn(values, mask, up):
+    columns = [_category_values(values, mask, up, c)
+               for c in range(N_CATEGORIES) if mask >> c & 1]
+    final = list(map(max, *columns)) if len(columns) > 1 else columns[0]
+    keep1 = _keep_values(final)
+    keep2 = _keep_values(_best_keeps(keep1))
+    first = _best_keeps(keep2)
+    return (keep1, keep2), first
+
+# ============================================================
+# TABLE GENERATION AND STORAGE
+# ============================================================
+def build_values(progress=None):
+    values = array.array('d', bytes(8 * TABLE_SIZE))
+    reach = _reachable_upper()
+    masks = sorted(range(1, FULL_MASK + 1), key=_popcount)
+    for done, mask in enumerate(masks, 1):
+        for up in reach[~mask & 0x3F]:
+            first = _turn(values, mask, up)[1]
+            values[mask * UPPER_STATES + up] = sum(map(mul, ROLL_PROB, first))
+        if progress and done % 64 == 0:
+            progress(done, len(masks))
+    return values
+
+def save_values(values, path=VALUES_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        array.array('f', values).tofile(f)
+    os.replace(tmp, path)
+
+# Returns the table as a read-only float view of a memory-mapped file, or
+# None if the file is missing, malformed or from another format version, so
+# that it gets rebuilt.
+def load_values(path=VALUES_PATH):
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    header = mapped[:len(MAGIC)]
+    if header not in (MAGIC, SWAPPED_MAGIC) or len(mapped) != len(MAGIC) + 4 * TABLE_SIZE:
+        mapped.close()
+        return None
+    if header == MAGIC:
+        return memoryview(mapped)[len(MAGIC):].cast('f')
+    swapped = array.array('f', mapped[len(MAGIC):])
+    swapped.byteswap()
+    mapped.close()
+    return swapped
+
+# ============================================================
+# SOLVER
+# ============================================================
+def scorecard_state(scorecard):
+    return scorecard.open_mask, min(scorecard.upper_total, UPPER_CAP)
+
+class YahtzeeSolver:
+    def __init__(self, values):
+        self.values = values
+        self._turns = {}
+
+    def _turn(self, mask, up):
+        key = mask * UPPER_STATES + up
+        turn = self._turns.get(key)
+        if turn is None:
+            if len(self._turns) >= TURN_CACHE_SIZE:
+                self._turns.clear()
+            turn = self._turns[key] = _turn(self.values, mask, up)
+        return turn
+
+    # Expected points still to come from a between-turns state.
+    def state_value(self, mask, up):
+        return self.values[mask * UPPER_STATES + min(up, UPPER_CAP)]
+
+    def expected_score(self):
+        return self.state_value(FULL_MASK, 0)
+
+    # Best dice to hold with rolls_left (1 or 2) rerolls remaining; returns
+    # (kept dice, expected value). Holding all five means stop rolling.
+    def best_hold(self, dice, rolls_left, mask, up):
+        keep_values = self._turn(mask, min(up, UPPER_CAP))[0][rolls_left - 1]
+        keeps = ROLL_KEEPS[ROLL_INDEX[signature(dice)]]
+        best = max(keeps, key=keep_values.__getitem__)
+        return KEEPS[best], keep_values[best]
+
+    # Best open category for a final roll; returns (category, expected value).
+    def best_category(self, dice, mask, up):
+        up = min(up, UPPER_CAP)
+        best = None
+        for c in range(N_CATEGORIES):
+            if not mask >> c & 1:
+                continue
+            score = yahtzee_score(dice, YAHTZEE_CATEGORIES[c])
+            rest = (mask & ~(1 << c)) * UPPER_STATES
+            new_up = up
+            if c < len(YAHTZEE_UPPER):
+                new_up = min(UPPER_CAP, up + score)
+                if up < UPPER_CAP <= new_up:
+                    score += UPPER_BONUS
+            value = score + self.values[rest + new_up]
+            if best is None or value > best[1]:
+                best = (YAHTZEE_CATEGORIES[c], value)
+        return best
+
+# Positions (0-based) in dice that make up the multiset kept.
+def hold_positions(dice, kept):
+    remaining = count_values(kept)
+    positions = []
+    for i, die in enumerate(dice):
+        if remaining.get(die):
+            remaining[die] -= 1
+            positions.append(i)
+    return positions
+
+_SOLVER = None
+
+# Shared solver over the memory-mapped table, or None if it has not been
+# generated yet.
+def get_solver(path=VALUES_PATH):
+    global _SOLVER
+    if _SOLVER is None:
+        values = load_values(path)
+        if values is not None:
+            _SOLVER = YahtzeeSolver(values)
+    return _SOLVER
+
+# Bot player following the solver, usable wherever emodice_sim accepts a
+# Yahtzee policy.
+class OptimalYahtzeePolicy:
+    def __init__(self, solver=None):
+        self.solver = solver
+
+    def _solver(self):
+        if self.solver is None:
+            self.solver = get_solver()
+            if self.solver is None:
+                raise RuntimeError("Yahtzee value table missing or out of date; run: python3 emodice_solver.py")
+        return self.solver
+
+    def __getstate__(self):
+        return {'solver': None}
+
+    def hold(self, dice, rolls_left, scorecard):
+        mask, up = scorecard_state(scorecard)
+        return self._solver().best_hold(dice, rolls_left, mask, up)[0]
+
+    def choose(self, dice, scorecard):
+        mask, up = scorecard_state(scorecard)
+        return self._solver().best_category(dice, mask, up)[0]
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else VALUES_PATH
+    def progress(done, total):
+        print(f"\r  {done}/{total} category sets", end="", flush=True)
+    print("Building optimal Yahtzee value table (this takes a while)...")
+    values = build_values(progress)
+    save_values(values, path)
+    print(f"\nExpected score under optimal play: {values[FULL_MASK * UPPER_STATES]:.4f}")
+    print(f"Saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+emodice_stream.py - Constant-memory streaming rolls for long emodice runs
+https://github.com/D1A881/emodice
+
+Rolls are generated lazily in fixed-size roll_many chunks and flow through
+ordinary generator stages, so memory stays flat however long a run lasts:
+
+    rolls = roll_stream(5, include_skull=True, seed=1, limit=10**9)
+    stats, streak = run(scores(rolls, 'skulls'), RunningStats(), Streak(lambda s: s == 0))
+"""
+
+import itertools
+import math
+from collections import Counter
+
+from emodice import (
+    SKULL, SKULL_LIMIT, SKULL_SURVIVAL_DICE, TARGET_ATTEMPTS, make_dice, roll_many,
+    score_doubles, score_sequences, sum_dice, yahtzee_scores,
+)
+from emodice_sim import DiceStream, SkullThreshold
+
+CHUNK_ROLLS = 4096
+
+# ============================================================
+# SOURCES
+# ============================================================
+# Yields flat chunks of integer-coded rolls (up to chunk_rolls rolls of
+# dice_per_roll dice each), forever or until limit rolls have been produced.
+def roll_chunks(dice_per_roll, include_skull=False, rng=None, seed=None,
+                limit=None, chunk_rolls=CHUNK_ROLLS):
+    rng = rng or make_dice('mt', seed)
+    produced = 0
+    while limit is None or produced < limit:
+        size = chunk_rolls if limit is None else min(chunk_rolls, limit - produced)
+        yield roll_many(size, dice_per_roll, include_skull, rng)
+        produced += size
+
+# Yields one roll (bytes of face codes) at a time.
+def roll_stream(dice_per_roll, include_skull=False, rng=None, seed=None,
+                limit=None, chunk_rolls=CHUNK_ROLLS):
+    for chunk in roll_chunks(dice_per_roll, include_skull, rng, seed, limit, chunk_rolls):
+        for start in range(0, len(chunk), dice_per_roll):
+            yield chunk[start:start + dice_per_roll]
+
+# Yields (final score, busted) for each Skull Survival game played with
+# policy(score, skulls).
+def skull_survival_games(policy=None, rng=None, seed=None, limit=None):
+    policy = policy or SkullThreshold(25)
+    stream = DiceStream(rng or make_dice('mt', seed), include_skull=True)
+    games = itertools.count() if limit is None else range(limit)
+    for _ in games:
+        score = skulls = 0
+        busted = False
+        while policy(score, skulls):
+            dice = stream.take(SKULL_SURVIVAL_DICE)
+            score += sum_dice(dice)
+            skulls += dice.count(SKULL)
+            if skulls >= SKULL_LIMIT:
+                busted = True
+                break
+        yield score, busted
+
+# Yields the attempt on which each Target Number game hit the target, or
+# None for a miss.
+def target_number_games(count, target, attempts=TARGET_ATTEMPTS, rng=None, seed=None, limit=None):
+    totals = map(sum_dice, roll_stream(count, rng=rng, seed=seed,
+                                       limit=None if limit is None else limit * attempts))
+    while True:
+        game = list(itertools.islice(totals, attempts))
+        if len(game) < attempts:
+            return
+        yield game.index(target) + 1 if target in game else None
+
+# ============================================================
+# STAGES
+# ============================================================
+def _skulls(dice):
+    return dice.count(SKULL)
+
+SCORE_RULES = {
+    'sum': sum_dice,
+    'skulls': _skulls,
+    'doubles': score_doubles,
+    'sequences': score_sequences,
+    'yahtzee': yahtzee_scores,
+}
+
+# Maps each roll to its score under a named rule or any callable.
+def scores(rolls, rule):
+    if not callable(rule):
+        try:
+            rule = SCORE_RULES[rule]
+        except KeyError:
+            raise ValueError(f"Unknown rule: {rule!r}") from None
+    return map(rule, rolls)
+
+def where(stream, predicate):
+    return filter(predicate, stream)
+
+def take(stream, n):
+    return itertools.islice(stream, n)
+
+# ============================================================
+# AGGREGATES
+# ============================================================
+# Each aggregate holds O(1) state (Histogram: one slot per distinct value)
+# and is fed one item at a time through add().
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.mean, 'variance': self.variance(),
+                'stdev': math.sqrt(self.variance()), 'min': self.min, 'max': self.max}
+
+class Histogram:
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, value):
+        self.counts[value] += 1
+
+    def summary(self):
+        return dict(sorted(self.counts.items(), key=lambda kv: (kv[0] is None, kv[0])))
+
+# Tracks the current and longest run of consecutive items matching predicate.
+class Streak:
+    def __init__(self, predicate):
+        self.predicate = predicate
+        self.current = 0
+        self.longest = 0
+
+    def add(self, value):
+        if self.predicate(value):
+            self.current += 1
+            if self.current > self.longest:
+                self.longest = self.current
+        else:
+            self.current = 0
+
+    def summary(self):
+        return {'current': self.current, 'longest': self.longest}
+
+# Drains stream into the aggregates and returns them.
+def run(stream, *aggregates):
+    adds = [a.add for a in aggregates]
+    if len(adds) == 1:
+        add = adds[0]
+        for item in stream:
+            add(item)
+    else:
+        for item in stream:
+            for add in adds:
+                add(item)
+    return aggregates
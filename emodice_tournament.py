@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+emodice_tournament.py - Yahtzee bot tournaments with common random numbers
+https://github.com/D1A881/emodice
+
+Every strategy plays the same games on the same dice. Each game's dice are
+rolled up front, 13 turns x 3 rolls x 5 dice, and a strategy rerolling k
+dice takes the first k of that roll's five, so score differences between
+strategies come from their decisions and not from luck. Paired on equal
+dice, far fewer games separate two strategies than with independent rolls.
+
+Games are played in blocks, each with its own seed derived from the master
+seed, on a process pool; a run is fully determined by the seed, whatever
+the number of workers. Results are per-strategy score distributions, a
+head-to-head record for every pair and Elo-scale ratings.
+
+    python3 emodice_tournament.py greedy upper optimal mybots:Bot -n 10000 --seed 1
+
+Strategies are Yahtzee policies as in emodice_sim: hold(dice, rolls_left,
+scorecard) and choose(dice, scorecard). A user strategy is named as
+module:Class and must be importable in the worker processes.
+"""
+
+import argparse
+import importlib
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from emodice import (
+    DICE_BACKENDS, YAHTZEE_CATEGORIES, Scorecard, derive_seed, make_dice, roll_many, yahtzee_score,
+)
+from emodice_sim import (
+    GreedyYahtzeePolicy, SimResult, UpperBonusYahtzeePolicy, checked_category, checked_hold,
+)
+
+TURN_DICE = 15
+GAME_DICE = TURN_DICE * len(YAHTZEE_CATEGORIES)
+BLOCK_GAMES = 250
+BASE_RATING = 1500
+
+def _optimal():
+    from emodice_solver import OptimalYahtzeePolicy, get_solver
+    solver = get_solver()
+    if solver is None:
+        raise RuntimeError("Yahtzee value table missing or out of date; run: python3 emodice_solver.py")
+    return OptimalYahtzeePolicy(solver)
+
+STRATEGIES = {
+    'greedy': GreedyYahtzeePolicy,
+    'upper': UpperBonusYahtzeePolicy,
+    'optimal': _optimal,
+}
+
+# A built-in strategy name or module:Class for a user strategy.
+def load_strategy(spec):
+    if spec in STRATEGIES:
+        return STRATEGIES[spec]()
+    module, sep, name = spec.partition(':')
+    if not sep:
+        raise ValueError(f"Unknown strategy: {spec!r} (built in: {', '.join(STRATEGIES)}; or module:Class)")
+    return getattr(importlib.import_module(module), name)()
+
+# Plays one game on pre-rolled dice: turn t, roll r draws from
+# dice[TURN_DICE*t + 5*r:], so every strategy sees the same dice in the same
+# slots. Holds and categories are checked as in emodice_sim.play_yahtzee.
+def play_common(policy, dice):
+    scorecard = Scorecard()
+    for turn in range(len(YAHTZEE_CATEGORIES)):
+        rolls = dice[turn * TURN_DICE:(turn + 1) * TURN_DICE]
+        hand = rolls[:5]
+        for roll, rolls_left in ((1, 2), (2, 1)):
+            kept = checked_hold(policy, hand, policy.hold(hand, rolls_left, scorecard))
+            if len(kept) >= 5:
+                break
+            hand = kept + rolls[5 * roll:5 * roll + 5 - len(kept)]
+        cat = checked_category(policy, scorecard, policy.choose(hand, scorecard))
+        scorecard.fill(cat, yahtzee_score(hand, cat))
+    return scorecard
+
+# ============================================================
+# RESULTS
+# ============================================================
+# Head-to-head record of strategy a against b over the same games, with
+# the sums needed for the mean and standard error of the paired score
+# difference.
+class Pairing:
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        self.wins = self.losses = self.draws = 0
+        self.diff_sum = self.diff_squares = 0
+
+    @property
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+    def add(self, score_a, score_b):
+        diff = score_a - score_b
+        if diff > 0:
+            self.wins += 1
+        elif diff < 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        self.diff_sum += diff
+        self.diff_squares += diff * diff
+
+    def merge(self, other):
+        self.wins += other.wins
+        self.losses += other.losses
+        self.draws += other.draws
+        self.diff_sum += other.diff_sum
+        self.diff_squares += other.diff_squares
+        return self
+
+    def mean_diff(self):
+        return self.diff_sum / self.games if self.games else 0.0
+
+    def stderr(self):
+        n = self.games
+        if n < 2:
+            return None
+        variance = (self.diff_squares - self.diff_sum ** 2 / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0) / n)
+
+    def summary(self):
+        stderr = self.stderr()
+        mean = self.mean_diff()
+        return {
+            'a': self.a, 'b': self.b, 'games': self.games,
+            'wins': self.wins, 'losses': self.losses, 'draws': self.draws,
+            'mean_diff': mean, 'stderr': stderr,
+            'z': mean / stderr if stderr else None,
+        }
+
+class TournamentResult:
+    def __init__(self, names):
+        self.names = list(names)
+        self.seed = None
+        self.results = {name: SimResult('yahtzee') for name in self.names}
+        self.pairs = {(a, b): Pairing(a, b) for a, b in combinations(self.names, 2)}
+
+    def merge(self, other):
+        for name, result in other.results.items():
+            self.results[name].merge(result)
+        for key, pairing in other.pairs.items():
+            self.pairs[key].merge(pairing)
+        return self
+
+    # Bradley-Terry strengths fitted to the head-to-head records (draws
+    # count half), on the Elo scale: a 400 point gap means 10:1 odds. Each
+    # pair gets one virtual draw so a strategy that never loses still has a
+    # finite rating. Unlike sequential Elo updates the result does not
+    # depend on the order games were played in.
+    def ratings(self, iterations=500):
+        if len(self.names) < 2:
+            return {name: float(BASE_RATING) for name in self.names}
+        wins = {name: 0.0 for name in self.names}
+        games = {}
+        for (a, b), p in self.pairs.items():
+            wins[a] += p.wins + (p.draws + 1) / 2
+            wins[b] += p.losses + (p.draws + 1) / 2
+            games[a, b] = games[b, a] = p.games + 1
+        strength = {name: 1.0 for name in self.names}
+        for _ in range(iterations):
+            updated = {}
+            for i in self.names:
+                denominator = sum(games[i, j] / (strength[i] + strength[j])
+                                  for j in self.names if j != i)
+                updated[i] = wins[i] / denominator
+            scale = math.exp(sum(math.log(s) for s in updated.values()) / len(updated))
+            strength = {name: s / scale for name, s in updated.items()}
+        return {name: BASE_RATING + 400 * math.log10(s) for name, s in strength.items()}
+
+    def summary(self):
+        ratings = self.ratings()
+        standings = sorted(self.names, key=ratings.__getitem__, reverse=True)
+        strategies = {}
+        for name in standings:
+            entry = self.results[name].summary()
+            del entry['game'], entry['seed']
+            entry['rating'] = ratings[name]
+            strategies[name] = entry
+        return {
+            'seed': self.seed,
+            'games': self.results[self.names[0]].games if self.names else 0,
+            'standings': standings,
+            'strategies': strategies,
+            'head_to_head': [p.summary() for p in self.pairs.values()],
+        }
+
+# ============================================================
+# RUNNER
+# ============================================================
+def _play_block(job):
+    n_games, block_seed, strategies, backend = job
+    result = TournamentResult(strategies)
+    dice = roll_many(n_games, GAME_DICE, False, make_dice(backend, block_seed))
+    pairs = list(result.pairs.values())
+    index = {name: i for i, name in enumerate(strategies)}
+    for start in range(0, len(dice), GAME_DICE):
+        game = dice[start:start + GAME_DICE]
+        scores = []
+        for name, policy in strategies.items():
+            try:
+                scorecard = play_common(policy, game)
+            except ValueError as e:
+                raise ValueError(f"strategy {name} disqualified: {e}") from None
+            result.results[name].add(scorecard.grand_total,
+                                     'bonus' if scorecard.upper_bonus else 'no_bonus')
+            scores.append(scorecard.grand_total)
+        for pairing in pairs:
+            pairing.add(scores[index[pairing.a]], scores[index[pairing.b]])
+    return result
+
+# Plays n_games with every strategy (a dict of name -> policy) on the same
+# dice and returns a TournamentResult. Blocks of games are spread over
+# workers processes (default: all cores); with no seed a random master seed
+# is drawn and recorded for replay.
+def tournament(strategies, n_games, seed=None, workers=None, backend='mt', block_games=BLOCK_GAMES):
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    workers = max(1, workers or os.cpu_count() or 1)
+    sizes = [min(block_games, n_games - start) for start in range(0, n_games, block_games)]
+    jobs = [(size, derive_seed(seed, 'tournament', block), strategies, backend)
+            for block, size in enumerate(sizes)]
+    result = TournamentResult(strategies)
+    result.seed = seed
+    if workers == 1 or len(jobs) <= 1:
+        blocks = list(map(_play_block, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            blocks = list(pool.map(_play_block, jobs))
+    for block in blocks:
+        result.merge(block)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="emodice_tournament", description="Yahtzee bot tournament.")
+    parser.add_argument('strategies', nargs='+',
+                        help=f"strategies to play: {', '.join(STRATEGIES)} or module:Class")
+    parser.add_argument('--games', '-n', type=int, default=1000, help="games per strategy (default 1000)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', '-w', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--rng', choices=list(DICE_BACKENDS), default='mt', help="dice generator (default mt)")
+    args = parser.parse_args(argv)
+    if len(set(args.strategies)) != len(args.strategies):
+        parser.error("each strategy can only be entered once")
+    try:
+        strategies = {spec: load_strategy(spec) for spec in args.strategies}
+    except (ImportError, AttributeError, RuntimeError, ValueError) as e:
+        raise SystemExit(str(e))
+    try:
+        result = tournament(strategies, args.games, seed=args.seed, workers=args.workers, backend=args.rng)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(json.dumps(result.summary(), indent=2))
+
+if __name__ == "__main__":
+    main()